@@ -167,9 +167,4 @@ module async_fifo #(
             .gry_cnt_reg    (rd_ptr_gry)
         );
 
-    initial begin
-        $dumpfile("async_fifo.vcd");
-        $dumpvars();
-    end
-
 endmodule
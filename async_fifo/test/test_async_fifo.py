@@ -1,20 +1,28 @@
 
+import math
+import os
 import random
 import cocotb
 import logging
-from cocotb.queue import Queue
-from cocotb.clock import Clock
+from test_classes import ClockDomain, FifoProbe, Scoreboard, StreamDriver, StreamMonitor, TxLog, cycle_rst_n, metrics, results, stream
+from cocotb.utils import get_sim_time
 from cocotb.triggers import First, RisingEdge, ClockCycles, with_timeout, Timer, FallingEdge, Combine
 
 class TB():
     def __init__(self, dut, wr_prd, rd_prd):
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
-        self.sb = Queue()
-
-        cocotb.start_soon(Clock(dut.wr_clk, wr_prd, units='ns').start())
-        cocotb.start_soon(Clock(dut.rd_clk, rd_prd, units='ns').start())
+        self.sb = Scoreboard('fifo')
+        self.txlog = TxLog('async_fifo.txlog')
+        self.wr_ch = self.txlog.channel('wr')
+        self.rd_ch = self.txlog.channel('rd')
+
+        self.wr_domain = ClockDomain.start(dut.wr_clk, wr_prd, jitter=JITTER, seed=random.getrandbits(32))
+        self.rd_domain = ClockDomain.start(dut.rd_clk, rd_prd, phase=RD_PHASE, jitter=JITTER,
+                                           seed=random.getrandbits(32))
+        # Edges write and read wait for a handshake, 10 us on either clock
+        self.wr_timeout = math.ceil(10000 / wr_prd)
+        self.rd_timeout = math.ceil(10000 / rd_prd)
         self.dut.wr_data.value = 0
         self.dut.wr_vld.value = 0
         self.dut.rd_rdy.value = 0
@@ -31,17 +39,14 @@ class TB():
             self.dut.wr_vld.value = 1
             self.dut.wr_data.value = data
 
-            await FallingEdge(self.dut.wr_clk)
-            if (self.dut.wr_rdy != 1):
-                await First(RisingEdge(self.dut.wr_rdy), Timer(10, 'us'))
-                if (self.dut.wr_rdy != 1):
-                    return
-
-            await RisingEdge(self.dut.wr_clk)
+            done = await self.wr_domain.until(self.dut.wr_vld, self.dut.wr_rdy, timeout=self.wr_timeout)
 
             self.dut.wr_vld.value = 0
             self.dut.wr_data.value = 0
-            await self.sb.put(data)
+            if done is None:
+                return
+            self.sb.put(data)
+            self.txlog.log(self.wr_ch, data)
 
     # This method calls the write method
     # in order to fill the FIFO
@@ -55,7 +60,8 @@ class TB():
         for _ in range(num):
             delay = random.randint(0,wait)
             await self.write()
-            await ClockCycles(self.dut.wr_clk, delay)
+            if delay:
+                await self.wr_domain.wait(delay)
 
     # This method calls the write method
     # in order to fill the FIFO
@@ -71,59 +77,56 @@ class TB():
 
             self.dut.rd_rdy.value = 1
 
-            await FallingEdge(self.dut.rd_clk)
-            if (self.dut.rd_vld != 1):
-                await First(RisingEdge(self.dut.rd_vld), Timer(10, 'us'))
-                if (self.dut.rd_vld != 1):
-                     return
-                
-            rd_data = self.dut.rd_data
-            await RisingEdge(self.dut.rd_clk)
+            rd_data = await self.rd_domain.until(self.dut.rd_vld, self.dut.rd_rdy,
+                                                 sample=self.dut.rd_data, timeout=self.rd_timeout)
             self.dut.rd_rdy.value = 0
+            if rd_data is None:
+                return
 
-            sb_data = await with_timeout(self.sb.get(), 10, 'us')
-            print(f'{int(rd_data)} = {sb_data}')
-            assert rd_data == sb_data
+            self.txlog.log(self.rd_ch, rd_data)
+            self.sb.check(rd_data)
+
+    # This method waits for the FIFO to hold a word
+    async def wait_rd_vld(self):
+        if (self.dut.rd_vld != 1):
+            assert await self.rd_domain.until(self.dut.rd_vld, timeout=self.rd_timeout), 'rd_vld never rose'
 
     # This method repeatedly calls read
     async def read_mult(self, num=1):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         for _ in range(num):
             await self.read()
 
     # This method repeatedly calls read
     async def read_mult_delay(self, num=1, wait=10):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         for _ in range(num):
             delay = random.randint(0,wait)
             await self.read()
-            await ClockCycles(self.dut.rd_clk, delay)
+            if delay:
+                await self.rd_domain.wait(delay)
 
     # This method repeatedly calls read until
     # the FIFO is empty
     async def empty_fifo(self):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         while self.dut.rd_vld == 1:
             await self.read()
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
-WR_PRD      = 2
-RD_PRD      = 34
+# Clock setup, overridden per point by the regression clock sweep.
+# Periods, phase and jitter are in ns; RD_PHASE delays the first rd_clk
+# edge and JITTER moves every edge of both clocks by up to +/- that much.
+WR_PRD      = float(os.getenv("WR_PRD", 2))
+RD_PRD      = float(os.getenv("RD_PRD", 34))
+RD_PHASE    = float(os.getenv("RD_PHASE", 0))
+JITTER      = float(os.getenv("JITTER", 0))
 NUM_LOOPS   = 20
+NUM_STREAM  = 2000
 
 # Declare parameter values
 FIFO_DEPTH = int(cocotb.top.P_DEPTH)
@@ -142,22 +145,108 @@ async def test_async_fifo(dut):
     # Declare testbench and scoreboard
     tb = TB(dut, WR_PRD, RD_PRD)
 
-    # Reset design
+    try:
+        # Reset design
+        cocotb.start_soon(cycle_rst_n(dut.wr_rst_n, dut.wr_clk))
+        cocotb.start_soon(cycle_rst_n(dut.rd_rst_n, dut.rd_clk))
+
+        # Wait some arbitrary time
+        await ClockCycles(dut.wr_clk, 100)
+        probe = FifoProbe(dut.wr_clk, dut.wr_vld, dut.wr_rdy, dut.rd_clk, dut.rd_vld, dut.rd_rdy, 'async_fifo')
+
+        # These are the two functions I would like to have
+        # running concurrently!!!!
+        write_task = cocotb.start_soon(tb.write_mult_delay(1000))
+        read_task = cocotb.start_soon(tb.read_mult_delay(1000))
+
+        done = Combine(write_task, read_task)
+
+        await First(done, Timer(500, 'us'))
+
+        await ClockCycles(dut.wr_clk, 100)
+    finally:
+        tb.txlog.close()
+    probe.export()
+    tb.sb.finish()
+    dut._log.info('Test done')
+
+
+
+async def stream_words(tb, pattern_wr=None, pattern_rd=None, name='stream'):
+    '''
+    Streams NUM_STREAM random words through the fifo and waits
+    until every one of them has been read back and checked
+    '''
+    dut = tb.dut
+    metrics.start(name)
+    probe = FifoProbe(dut.wr_clk, dut.wr_vld, dut.wr_rdy, dut.rd_clk, dut.rd_vld, dut.rd_rdy, name)
+    start = get_sim_time('ns')
+    wr = StreamDriver(dut.wr_clk, dut.wr_data, dut.wr_vld, dut.wr_rdy,
+                      pattern=pattern_wr, callback=tb.sb.put, name='wr')
+    rd = StreamMonitor(dut.rd_clk, dut.rd_data, dut.rd_vld, dut.rd_rdy,
+                       pattern=pattern_rd, callback=tb.sb.check, name='rd')
+
+    wr.send([random.randint(0, 2**FIFO_WIDTH-1) for _ in range(NUM_STREAM)])
+    await with_timeout(wr.wait(), 1000, 'us')
+    # Each word left in the fifo must be read within rd_timeout edges of the last
+    pending, idle = len(tb.sb), 0
+    while pending and idle < tb.rd_timeout:
+        await tb.rd_domain.wait()
+        idle = idle + 1 if len(tb.sb) == pending else 0
+        pending = len(tb.sb)
+    assert not pending, f'{name}: {pending} words never read back'
+    elapsed = get_sim_time('ns') - start
+
+    tb.log.info(str(wr.stats))
+    tb.log.info(str(rd.stats))
+    probe.export()
+    tb.log.info(f'{1000 * NUM_STREAM / elapsed:.1f} words/us')
+    tb.sb.finish()
+    metrics.finish()
+    return wr.stats, rd.stats, 1000 * NUM_STREAM / elapsed
+
+
+async def reset(dut):
     cocotb.start_soon(cycle_rst_n(dut.wr_rst_n, dut.wr_clk))
     cocotb.start_soon(cycle_rst_n(dut.rd_rst_n, dut.rd_clk))
+    await ClockCycles(dut.rd_clk, 10)
+    await ClockCycles(dut.wr_clk, 10)
 
-    # Wait some arbitrary time
-    await ClockCycles(dut.wr_clk, 100)
 
-    # These are the two functions I would like to have
-    # running concurrently!!!!
-    write_task = cocotb.start_soon(tb.write_mult_delay(1000))
-    read_task = cocotb.start_soon(tb.read_mult_delay(1000))
+async def throughput(dut, wr_prd, rd_prd, name):
+    '''
+    Streams back to back words and checks that the port on the slower
+    clock sustains one word per cycle. Clocks closer than 2:1 only have
+    their throughput recorded, since jitter lets either side stall.
+    '''
+    tb = TB(dut, wr_prd, rd_prd)
+    await reset(dut)
 
-    done = Combine(write_task, read_task)
+    wr_stats, rd_stats, rate = await stream_words(tb, name=name)
+    slow = rd_stats if rd_prd >= wr_prd else wr_stats
+    results.record(**{f'{name}_words_per_us': round(rate, 3),
+                      f'{name}_slow_port': round(slow.sustained(), 4)})
+    if max(wr_prd, rd_prd) >= 2 * min(wr_prd, rd_prd):
+        assert slow.sustained() >= 0.99
 
-    await First(done, Timer(500, 'us'))
 
-    await ClockCycles(dut.wr_clk, 100)
-    dut._log.info('Test done')
+@cocotb.test()
+async def test_async_fifo_throughput(dut):
+    """Back to back streaming with the configured write and read clocks"""
+    await throughput(dut, WR_PRD, RD_PRD, 'throughput')
+
+
+@cocotb.test()
+async def test_async_fifo_throughput_swapped(dut):
+    """Back to back streaming with the write and read clocks swapped"""
+    await throughput(dut, RD_PRD, WR_PRD, 'swapped')
+
+
+@cocotb.test()
+async def test_async_fifo_bursty(dut):
+    """Random idle cycles on the write side and backpressure on the read side"""
+
+    tb = TB(dut, 10, 14)
+    await reset(dut)
 
+    await stream_words(tb, stream.random_pattern(0.7), stream.burst(3, 2), 'bursty')
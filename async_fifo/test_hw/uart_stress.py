@@ -0,0 +1,283 @@
+'''
+Hardware in the loop stress test for a UART that echoes every byte back,
+such as the async_fifo board build.
+
+Random data is written in large buffers while a second thread reads the
+echo back and checks it against a scoreboard, so the line is kept busy in
+both directions. At the end the sustained rate and any lost or corrupted
+bytes are reported.
+
+    python uart_stress.py --port COM3 --baud 9600 --bytes 100000
+    python uart_stress.py --loopback --baud 115200
+
+--loopback stands in for the board with a pseudo terminal that echoes
+everything written to it, so the tool can be checked on a Linux machine
+with nothing attached. The pseudo terminal runs as fast as it can, so the
+rate reported in that mode says nothing about the baud rate.
+'''
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import serial
+
+
+##########################################
+##              SCOREBOARD              ##
+##########################################
+
+class Scoreboard():
+    def __init__(self, resync=4, window=4096):
+        '''
+        Checks the received stream against the bytes sent, in order. On a
+        mismatch the next resync received bytes are searched for in the
+        next window expected bytes, so a dropped byte is counted once as
+        lost instead of failing every byte after it. The search allows
+        further drops between the bytes searched for, so drops close
+        together are not mistaken for corruption.
+
+        :param self: Class instance
+        :param resync: Received bytes that must match to resynchronize
+        :param window: Expected bytes searched ahead on a mismatch
+        '''
+        self.resync = resync
+        self.window = window
+        self.lock = threading.Lock()
+        self.expected = bytearray()
+        self.pending = bytearray()
+        self.pos = 0
+        self.base = 0                  # bytes dropped from the front of expected
+        self.received = 0
+        self.lost = 0
+        self.corrupt = 0
+        self.first_error = None
+
+    def sent(self, data):
+        with self.lock:
+            self.expected += data
+
+    def check(self, data):
+        with self.lock:
+            self.received += len(data)
+            self.pending += data
+            while self.pending:
+                if self.pos < len(self.expected) and self.pending[0] == self.expected[self.pos]:
+                    self.pos += 1
+                    del self.pending[0]
+                    continue
+                if self.first_error is None:
+                    self.first_error = self.base + self.pos
+                if not self._resync():
+                    return
+
+            # Drop what has been checked so the buffers stay bounded
+            if self.pos > 1 << 20:
+                del self.expected[:self.pos]
+                self.base += self.pos
+                self.pos = 0
+
+    def _match(self, probe):
+        # First expected position probe[0] can be at with the rest of probe
+        # following it in order, at most resync bytes dropped in between
+        end = self.pos + self.window + 2 * self.resync
+        skip = self.expected.find(probe, self.pos, end)
+        if skip >= 0:
+            return skip
+        skip = self.expected.find(probe[0], self.pos, end)
+        while skip >= 0:
+            at = skip + 1
+            for byte in probe[1:]:
+                at = self.expected.find(byte, at, skip + 2 * self.resync)
+                if at < 0:
+                    break
+                at += 1
+            else:
+                return skip
+            skip = self.expected.find(probe[0], skip + 1, end)
+        return -1
+
+    def _resync(self):
+        if len(self.pending) < self.resync:
+            # Wait for more data unless the stream has ended
+            return False
+        skip = self._match(bytes(self.pending[:self.resync]))
+        if skip < 0:
+            self.corrupt += 1
+            self.pos += 1
+            del self.pending[0]
+        else:
+            self.lost += skip - self.pos
+            self.pos = skip
+        return True
+
+    def finish(self):
+        '''
+        Flushes the tail held back for resynchronizing and counts every
+        byte sent but never checked as lost
+        '''
+        with self.lock:
+            while self.pending:
+                if self.pos < len(self.expected) and self.pending[0] == self.expected[self.pos]:
+                    self.pos += 1
+                    del self.pending[0]
+                    continue
+                if self.first_error is None:
+                    self.first_error = self.base + self.pos
+                skip = self._match(bytes(self.pending[:self.resync]))
+                if skip < 0:
+                    self.corrupt += 1
+                    self.pos += 1
+                    del self.pending[0]
+                else:
+                    self.lost += skip - self.pos
+                    self.pos = skip
+            self.lost += len(self.expected) - self.pos
+            self.pos = len(self.expected)
+
+
+##########################################
+##           LOOPBACK STAND-IN          ##
+##########################################
+
+def loopback(drop=0.0, seed=None):
+    '''
+    Opens a pseudo terminal and echoes everything written to it from a
+    background thread, dropping bytes with the given probability. Returns
+    the device name to open in place of the board.
+
+    :param drop: Probability of dropping each byte, to exercise the
+                 loss accounting
+    :param seed: Seed for the dropped bytes
+    '''
+    # termios only exists on POSIX, a board on COM3 does not need it
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    rng = random.Random(seed)
+
+    def echo():
+        while True:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return
+            if drop:
+                data = bytes(b for b in data if rng.random() >= drop)
+            os.write(master, data)
+
+    threading.Thread(target=echo, daemon=True).start()
+    return os.ttyname(slave)
+
+
+##########################################
+##              STRESS TEST             ##
+##########################################
+
+def stress(ser, num_bytes, chunk, timeout, seed=None):
+    '''
+    Writes num_bytes of random data in chunks while reading the echo back
+    on a second thread. Returns the scoreboard and the time between the
+    first and last byte received.
+
+    :param ser: Open serial port
+    :param num_bytes: Bytes to send
+    :param chunk: Bytes per write
+    :param timeout: Seconds to wait for the echo after the last write
+    :param seed: Seed for the data
+    '''
+    rng = random.Random(seed)
+    sb = Scoreboard()
+    done = threading.Event()
+    times = []
+
+    def reader():
+        idle_since = None
+        while True:
+            data = ser.read(max(ser.in_waiting, 1))
+            now = time.perf_counter()
+            if data:
+                if not times:
+                    times.append(now)
+                times[1:] = [now]
+                sb.check(data)
+                idle_since = None
+                if done.is_set() and sb.received >= num_bytes:
+                    return
+            elif done.is_set():
+                idle_since = idle_since or now
+                if now - idle_since >= timeout:
+                    return
+
+    ser.reset_input_buffer()
+    thread = threading.Thread(target=reader)
+    thread.start()
+
+    sent = 0
+    while sent < num_bytes:
+        data = rng.randbytes(min(chunk, num_bytes - sent))
+        sb.sent(data)
+        ser.write(data)
+        sent += len(data)
+    ser.flush()
+    done.set()
+    thread.join()
+    sb.finish()
+
+    elapsed = times[-1] - times[0] if len(times) > 1 else 0.0
+    return sb, elapsed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stress a UART echo over a serial port")
+    parser.add_argument("--port", default=None,
+                        help="serial port, e.g. COM3 or /dev/ttyUSB0")
+    parser.add_argument("--baud", type=int, default=9600,
+                        help="baud rate (default: 9600)")
+    parser.add_argument("--bytes", type=int, default=100000,
+                        help="number of bytes to send (default: 100000)")
+    parser.add_argument("--chunk", type=int, default=4096,
+                        help="bytes per write (default: 4096)")
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="seconds to wait for the echo to go quiet after the last write")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the data sent")
+    parser.add_argument("--loopback", action="store_true",
+                        help="echo through a local pseudo terminal instead of a board")
+    parser.add_argument("--drop", type=float, default=0.0,
+                        help="with --loopback, probability of dropping each byte")
+    args = parser.parse_args()
+    if not args.port and not args.loopback:
+        parser.error("one of --port or --loopback is required")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    port = loopback(args.drop, args.seed) if args.loopback else args.port
+
+    with serial.Serial(port, baudrate=args.baud, bytesize=8, timeout=0.1) as ser:
+        sb, elapsed = stress(ser, args.bytes, args.chunk, args.timeout, args.seed)
+
+    rate = sb.received / elapsed if elapsed else 0.0
+    line_rate = args.baud / 10         # start, 8 data and stop bit
+    print(f"Port       {port} at {args.baud} baud")
+    print(f"Sent       {args.bytes} bytes")
+    print(f"Received   {sb.received} bytes in {elapsed:.3f}s")
+    # A pseudo terminal ignores the baud rate, so only a board has a line rate
+    print(f"Sustained  {rate:.0f} bytes/s"
+          + ("" if args.loopback else f" ({100 * rate / line_rate:.1f}% of line rate)"))
+    print(f"Lost       {sb.lost} bytes ({100 * sb.lost / max(args.bytes, 1):.3f}%)")
+    print(f"Corrupt    {sb.corrupt} bytes")
+    if sb.first_error is not None:
+        print(f"First error at byte {sb.first_error}")
+    # The loopback only ever drops bytes, so corruption is a scoreboard bug
+    if args.loopback and sb.corrupt:
+        print("Scoreboard counted dropped bytes as corrupt")
+        sys.exit(2)
+    sys.exit(0 if not (sb.lost or sb.corrupt) else 1)
@@ -193,11 +193,5 @@ module axil_slave_if #(
     end
 
 
-    // Dump waves
-    initial begin
-        $dumpfile("axil_slave_if.vcd");
-        $dumpvars;
-    end
-
 
     endmodule
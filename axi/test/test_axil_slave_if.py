@@ -1,33 +1,31 @@
 
+import os
 import random
 import cocotb
 import logging
+import numpy as np
+from array import array
 from cocotbext.axi import AxiLiteBus, AxiLiteMaster
-from cocotb.queue import Queue
-from cocotb.clock import Clock
+from test_classes import ClockDomain, RegisterModel, cycle_rst_n, metrics, results, stream
 from cocotb.triggers import First, RisingEdge, ClockCycles, Timer, FallingEdge, Combine
+from cocotb.utils import get_sim_time
 
 class TB():
     def __init__(self, dut, prd):
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
+        metrics.start('axil_slave_if')
 
-        self.rw_sb = []
-        self.ro_sb = []
-
-        for _ in range(P_NUM_RW_REG):
-            self.rw_sb.append(Queue())
-
-        for _ in range(P_NUM_RO_REG):
-            self.ro_sb.append(Queue())
+        self.regs = RegisterModel(P_NUM_RW_REG, P_NUM_RO_REG, P_DATA_WIDTH)
 
         self.axim = AxiLiteMaster(AxiLiteBus.from_prefix(dut, "s_axi"), dut.s_axi_aclk, 
                                     dut.s_axi_aresetn, reset_active_level=False)
         
-        self.ro_reg = [self.dut.reg_2_data, self.dut.reg_3_data]
+        # PL side of the registers, RW registers are outputs, RO are inputs
+        self.pl_reg = [getattr(self.dut, f'reg_{i}_data') for i in range(NUM_REG)]
+        self.ro_reg = self.pl_reg[P_NUM_RW_REG:]
         
-        cocotb.start_soon(Clock(dut.s_axi_aclk, prd, units='ns').start())
+        self.domain = ClockDomain.start(dut.s_axi_aclk, prd)
 
         # set all signals to zero
         self.dut.s_axi_awaddr.value = 0
@@ -44,60 +42,53 @@ class TB():
         for reg in self.ro_reg:
             reg.value = 0
 
-    # Method to write to registers and scoreboard via axi
+    # Method to write to registers via axi and update the register model
     async def axi_write(self, addr, data):
-        await self.rw_sb[int(addr/NUM_BYTES)].put(data)
-        await self.axim.write(addr,data)
+        await self.regs.write(self.axim, addr, data)
 
-    # Method to read from registers via axi, pop from scoreboard, and compare
+    # Method to read from registers via axi and check against the model
     async def axi_read(self, addr):
-        rd_data = await self.axim.read(addr, NUM_BYTES)
-        sb_data = await self.rw_sb[int(addr/NUM_BYTES)].get()
-        assert rd_data.data == sb_data
+        await self.regs.read(self.axim, addr)
 
-    # Method to write to registers and scoreboard via pl
+    # Method to write to read only registers via pl
     async def pl_write(self, addr, data):
-        await self.ro_sb[int(addr/NUM_BYTES)-P_NUM_RW_REG].put(data)
-        await RisingEdge(self.dut.s_axi_aclk)
-        self.ro_reg[int(addr/NUM_BYTES)-P_NUM_RW_REG].value = data
-        await RisingEdge(self.dut.s_axi_aclk)
+        await self.domain.wait()
+        self.pl_reg[self.regs.index(addr)].value = data
+        self.regs.set_ro(self.regs.index(addr), data)
+        await self.domain.wait()
 
-    # Method to read from registers via pl, pop from scoreboard, and compare
+    # Method to read registers via pl and check against the model
     async def pl_read(self, addr):
         await FallingEdge(self.dut.s_axi_aclk)
-        rd_data = self.ro_reg[int(addr/NUM_BYTES)-P_NUM_RW_REG].value
-        sb_data = await self.ro_sb[int(addr/NUM_BYTES)-P_NUM_RW_REG].get()
-        assert rd_data == sb_data
+        index = self.regs.index(addr)
+        self.regs.check_value(index, self.pl_reg[index].value)
 
     # Method to continuously read and write from AXI registers
     async def axi_rw(self, num_loops):
         for _ in range(num_loops):
-            addr = random.randint(0, P_NUM_RW_REG-1)*NUM_BYTES
-            data = (random.randint(0, 2**P_DATA_WIDTH-1)).to_bytes(NUM_BYTES, byteorder='big')
+            addr = self.regs.address(random.randint(0, P_NUM_RW_REG-1))
+            data = (random.randint(0, 2**P_DATA_WIDTH-1)).to_bytes(NUM_BYTES, byteorder='little')
             await self.axi_write(addr,data)
             await self.axi_read(addr)
-            await ClockCycles(self.dut.s_axi_aclk, random.randint(5,20))
+            await self.domain.wait(random.randint(5,20))
     
     # Method to continuously read and write from pl registers
     async def pl_rw(self, num_loops):
         for _ in range(num_loops):
-            addr = random.randint(P_NUM_RW_REG, NUM_REG-1)*NUM_BYTES
+            addr = self.regs.address(random.randint(P_NUM_RW_REG, NUM_REG-1))
             data = random.randint(0, 2**P_DATA_WIDTH-1)
             await self.pl_write(addr,data)
             await self.pl_read(addr)
-            await ClockCycles(self.dut.s_axi_aclk, random.randint(5,20))
+            await self.domain.wait(random.randint(5,20))
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
 PRD         = 10
 NUM_LOOPS   = 100
 
+# Benchmark size and how many transactions are kept in flight at once
+NUM_BENCH       = int(os.getenv("NUM_BENCH", 400))
+NUM_OUTSTANDING = int(os.getenv("NUM_OUTSTANDING", 8))
+
 # Declare parameter values
 P_DATA_WIDTH = int(cocotb.top.P_DATA_WIDTH)
 P_NUM_RW_REG = int(cocotb.top.P_NUM_RW_REG)
@@ -134,5 +125,107 @@ async def test_async_fifo(dut):
     # Wait some arbitrary time
     await ClockCycles(dut.s_axi_aclk, 100)
 
+    metrics.finish()
+    dut._log.info('Test done')
+
+
+
+
+async def benchmark(tb, name, read_fraction, written):
+    '''
+    Runs NUM_BENCH random register accesses from NUM_OUTSTANDING concurrent
+    workers so the master always has transactions queued, then reports
+    transactions per cycle and the read and write latency distributions.
+    Reads are checked against every value written to that register so
+    far, kept per register in written, since the order of concurrent
+    accesses is not fixed.
+    '''
+    latency = {'write': array('q'), 'read': array('q')}
+
+    async def worker(num):
+        for _ in range(num):
+            reg = random.randrange(P_NUM_RW_REG)
+            start = get_sim_time('ns')
+            if random.random() < read_fraction:
+                rd_data = await tb.axim.read(reg*NUM_BYTES, NUM_BYTES)
+                latency['read'].append(int(get_sim_time('ns') - start))
+                assert int.from_bytes(rd_data.data, 'little') in written[reg]
+            else:
+                data = random.getrandbits(P_DATA_WIDTH)
+                written[reg].add(data)
+                await tb.axim.write(reg*NUM_BYTES, data.to_bytes(NUM_BYTES, 'little'))
+                latency['write'].append(int(get_sim_time('ns') - start))
+
+    start = get_sim_time('ns')
+    workers = [cocotb.start_soon(worker(NUM_BENCH // NUM_OUTSTANDING)) for _ in range(NUM_OUTSTANDING)]
+    await Combine(*workers)
+    cycles = (get_sim_time('ns') - start) / PRD
+
+    num = sum(len(l) for l in latency.values())
+    tb.log.info(f'{name}: {num} transactions in {cycles:.0f} cycles, {num/cycles:.3f} per cycle')
+    figures = {f'{name}_txn_per_cycle': round(num/cycles, 4)}
+    for kind, values in latency.items():
+        if not len(values):
+            continue
+        values = np.frombuffer(values, dtype=np.int64) / PRD
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        tb.log.info(f'{name}: {kind} latency p50 {p50:.1f}, p90 {p90:.1f}, p99 {p99:.1f}, '
+                    f'max {values.max():.0f} cycles')
+        figures[f'{name}_{kind}_p50_cycles'] = round(p50, 1)
+        figures[f'{name}_{kind}_p99_cycles'] = round(p99, 1)
+    results.record(**figures)
+
+
+@cocotb.test()
+async def test_axil_throughput(dut):
+    """Back to back AXI-Lite traffic with many transactions outstanding"""
+
+    tb = TB(dut, PRD)
+    cocotb.start_soon(cycle_rst_n(dut.s_axi_aresetn, dut.s_axi_aclk))
+    await ClockCycles(dut.s_axi_aclk, 10)
+
+    written = [{0} for _ in range(P_NUM_RW_REG)]
+    await benchmark(tb, 'write', 0.0, written)
+    await benchmark(tb, 'read', 1.0, written)
+    await benchmark(tb, 'mixed', 0.5, written)
+
+    # Stall AW and W independently so address and data arrive on
+    # different cycles, in either order
+    tb.axim.write_if.aw_channel.set_pause_generator(1 - x for x in stream.random_pattern(0.5))
+    tb.axim.write_if.w_channel.set_pause_generator(1 - x for x in stream.random_pattern(0.5))
+    await benchmark(tb, 'skewed', 0.5, written)
+
+    metrics.finish()
     dut._log.info('Test done')
 
+
+
+@cocotb.test()
+async def test_axil_registers(dut):
+    """Register map checks against the register model"""
+
+    tb = TB(dut, PRD)
+    cocotb.start_soon(cycle_rst_n(dut.s_axi_aresetn, dut.s_axi_aclk))
+    await ClockCycles(dut.s_axi_aclk, 10)
+
+    for _ in range(NUM_LOOPS):
+        # Bulk write every RW register and drive every RO register from the PL
+        await tb.regs.write_all(tb.axim, [random.getrandbits(P_DATA_WIDTH) for _ in range(P_NUM_RW_REG)])
+        for index in range(P_NUM_RW_REG, NUM_REG):
+            await tb.pl_write(tb.regs.address(index), random.getrandbits(P_DATA_WIDTH))
+
+        # Bulk read the whole map over AXI and check the PL side of every register
+        await tb.regs.read_all(tb.axim)
+        for index in range(NUM_REG):
+            tb.regs.check_value(index, tb.pl_reg[index].value)
+
+        # Partial write to random bytes of a register, which the DUT stores as a
+        # whole word with the unwritten bytes zeroed
+        index = random.randrange(NUM_REG)
+        offset = random.randrange(NUM_BYTES)
+        length = random.randint(1, NUM_BYTES-offset)
+        await tb.regs.write(tb.axim, tb.regs.address(index)+offset, random.randbytes(length))
+        await tb.regs.read(tb.axim, tb.regs.address(index))
+
+    metrics.finish()
+    dut._log.info('Test done')
@@ -91,11 +91,6 @@ module crc_8 #(
         crc_d[30] = crc_q[22] ^ crc_q[28] ^ crc_q[31] ^ data[4]   ^ data[7];
         crc_d[31] = crc_q[23] ^ crc_q[29] ^ data[5];
     end
-    
-    initial begin
-        $dumpfile("crc_8.vcd");
-        $dumpvars();
-    end
 
 
 endmodule
@@ -1,13 +1,11 @@
 
-import random
+import os
+import struct
 import cocotb
 import logging
-import sys
-sys.path.append("../../../..")
-import test_classes
-from cocotb.clock import Clock
-from cocotb.queue import Queue
-from cocotb.triggers import Timer, RisingEdge, ClockCycles, FallingEdge
+import numpy as np
+from test_classes import ClockDomain, crc, cycle_rst_n, pcap
+from cocotb.triggers import RisingEdge, ClockCycles, FallingEdge
 
 DEST    = b'\x01\x00\x5E\x28\x64\x01'
 SRC     = b'\x2C\xFA\xA2\xA7\x4F\x81'
@@ -22,8 +20,19 @@ CRC     = b'\xD0\x1D\x41\x1B'
 
 PACKET = DEST+SRC+TYPE+DATA1+DATA2+DATA3+DATA4+DATA5+DATA6+CRC
 
-print(type(PACKET))
-print(PACKET)
+# Frames checked per run. The default keeps a regression run to a few
+# minutes; set NUM_FRAMES to tens of thousands for a full confidence run.
+NUM_FRAMES  = int(os.getenv("NUM_FRAMES", 1000))
+MIN_LEN     = 64
+MAX_LEN     = 1518
+ERROR_RATE  = 0.25
+
+# Synthetic captures written and replayed on every run
+CAPTURE_FRAMES = 16
+
+# Optional capture to replay, and whether its frames still carry the FCS
+PCAP_FILE   = os.getenv("PCAP_FILE")
+PCAP_FCS    = int(os.getenv("PCAP_FCS", 0))
 
 class TB():
     def __init__(self, dut):
@@ -36,57 +45,222 @@ class TB():
         '''
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
-        self.sb = Queue()
+
+        # Position of the byte currently on data_in, and every
+        # position at which crc_vld was seen high
+        self.frame = 0
+        self.byte = 0
+        self.crc_hits = []
 
         self.dut.data_in.value = 0
         self.dut.data_in_vld.value = 0
         self.dut.byte_in_vld.value = 0
+        self.byte_in_vld = 0
 
-        cocotb.start_soon(Clock(self.dut.clk, 10, units='ns').start())
+        self.domain = ClockDomain.start(self.dut.clk, 10)
 
     async def send_data(self, data_in):
 
-        for byte in data_in:
+        for i, byte in enumerate(data_in):
+            self.byte = i
             self.dut.data_in_vld.value = 1
             self.dut.data_in.value = byte
-            await FallingEdge(self.dut.byte_in_vld)
+            await self.domain.until(self.dut.byte_in_vld)
 
             self.dut.data_in_vld.value = 0
             self.dut.data_in.value = 0
 
-    async def toggle_byte_vld(self):
-        while(True):
-            await RisingEdge(self.dut.clk)
-            self.dut.byte_in_vld.value = 1
-            await RisingEdge(self.dut.clk)
-            self.dut.byte_in_vld.value = 0
+    async def send_frames(self, frames, lengths):
+        '''
+        Sends every frame followed by one idle byte, which
+        returns the CRC register to its initial value
+
+        :param frames: Frames as returned by crc.random_frames
+        :param lengths: Frame lengths
+        '''
+        for i in range(len(lengths)):
+            self.frame = i
+            await self.send_data(frames[i, :lengths[i]].tobytes())
+            await self.domain.until(self.dut.byte_in_vld)
+
+    async def replay(self, frames):
+        '''
+        Sends frames from an iterator one at a time and checks crc_vld
+        on the last byte of each against the model. Nothing is kept per
+        frame, so the iterator may be arbitrarily long.
+
+        :param frames: Iterator of frames including their FCS
+        '''
+        num_frames = 0
+        num_good = 0
+        for i, frame in enumerate(frames):
+            self.frame = i
+            self.crc_hits.clear()
+            await self.send_data(frame)
+            await self.domain.until(self.dut.byte_in_vld)
+
+            expected = crc.check(frame)
+            seen = (i, len(frame)-1) in self.crc_hits
+            assert seen == expected, f'frame {i}: crc_vld {int(seen)}, expected {int(expected)}'
+            num_frames += 1
+            num_good += expected
+
+        return num_frames, num_good
+
+    def toggle_byte_vld(self):
+        '''
+        Driver callback, flips byte_in_vld on every rising edge
+        '''
+        self.byte_in_vld ^= 1
+        self.dut.byte_in_vld.value = self.byte_in_vld
+
+    def crc_monitor(self):
+        '''
+        Monitor callback, records the frame and byte being sent whenever
+        crc_vld is high. crc_vld is only ever high for the one cycle of
+        byte_in_vld, so every high sample is a separate pulse.
+        '''
+        if int(self.dut.crc_vld.value):
+            self.crc_hits.append((self.frame, self.byte))
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
  
 @cocotb.test()
 async def test_rmii_rx(dut):
     '''Test for crc 8'''
 
+    assert crc.P_RESIDUE == int(dut.P_RESIDUE.value) & 0xFFFFFFFF
+    assert crc.crc32(PACKET) == crc.RESIDUE
+
+    # Build every frame and its expected result before the simulation starts
+    rng = np.random.default_rng(cocotb.RANDOM_SEED)
+    frames, lengths = crc.random_frames(NUM_FRAMES, MIN_LEN, MAX_LEN, rng)
+    frames, corrupted = crc.inject_bit_errors(frames, lengths, ERROR_RATE, rng)
+
+    # The first frame is always the known good PACKET
+    frames[0, :len(PACKET)] = np.frombuffer(PACKET, dtype=np.uint8)
+    lengths[0] = len(PACKET)
+    corrupted[0] = False
+    expected = crc.check_frames(frames, lengths)
+    assert not expected[corrupted].any()
+
+    tb = TB(dut)
+
+    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+
+    tb.domain.add_driver(tb.toggle_byte_vld)
+
+    await ClockCycles(tb.dut.clk, 100)
+
+    tb.domain.add_monitor(tb.crc_monitor)
+
+    await tb.domain.until(tb.dut.byte_in_vld)
+    await cocotb.start_soon(tb.send_frames(frames, lengths))
+
+    # crc_vld on the last byte of a frame means the FCS checked out
+    seen = np.zeros(NUM_FRAMES, dtype=bool)
+    for frame, byte in tb.crc_hits:
+        if byte == lengths[frame]-1:
+            seen[frame] = True
+
+    missed = np.flatnonzero(expected & ~seen)
+    false_hits = np.flatnonzero(~expected & seen)
+    tb.log.info(f'{NUM_FRAMES} frames, {int(corrupted.sum())} corrupted, {int(seen.sum())} passed CRC')
+    assert len(missed) == 0, f'crc_vld missing for good frames {missed[:10].tolist()}'
+    assert len(false_hits) == 0, f'crc_vld set for bad frames {false_hits[:10].tolist()}'
+
+    await ClockCycles(tb.dut.clk, 100)
+    dut._log.info('Test done')
+
+
+def write_pcap(path, frames):
+    '''
+    Writes frames to a little endian pcap file with an Ethernet link type
+    '''
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, pcap.LINKTYPE_ETHERNET))
+        for i, frame in enumerate(frames):
+            f.write(struct.pack("<IIII", i, 0, len(frame), len(frame)) + frame)
+
+
+def write_pcapng(path, frames):
+    '''
+    Writes frames to a pcapng file, alternating enhanced and simple packet
+    blocks on an Ethernet interface. A packet on a second, non-Ethernet
+    interface comes before each frame and must be skipped by the reader.
+    '''
+    def block(block_type, body):
+        body += bytes(-len(body) % 4)
+        return struct.pack("<II", block_type, len(body) + 12) + body + struct.pack("<I", len(body) + 12)
+
+    with open(path, "wb") as f:
+        f.write(block(pcap.BLOCK_SHB, struct.pack("<IHHq", pcap.BYTE_ORDER_MAGIC, 1, 0, -1)))
+        f.write(block(pcap.BLOCK_IDB, struct.pack("<HHI", pcap.LINKTYPE_ETHERNET, 0, 65535)))
+        f.write(block(pcap.BLOCK_IDB, struct.pack("<HHI", 0, 0, 65535)))
+        for i, frame in enumerate(frames):
+            f.write(block(pcap.BLOCK_EPB, struct.pack("<IIIII", 1, 0, i, 4, 4) + bytes(4)))
+            if i % 2:
+                f.write(block(pcap.BLOCK_SPB, struct.pack("<I", len(frame)) + frame))
+            else:
+                f.write(block(pcap.BLOCK_EPB, struct.pack("<IIIII", 0, 0, i, len(frame), len(frame)) + frame))
+
+
+@cocotb.test()
+async def test_pcap_synthetic(dut):
+    '''Replay small pcap and pcapng captures built by the test through crc 8'''
+
+    rng = np.random.default_rng(cocotb.RANDOM_SEED)
+    frames, lengths = crc.random_frames(CAPTURE_FRAMES, MIN_LEN, 256, rng)
+    frames, _ = crc.inject_bit_errors(frames, lengths, ERROR_RATE, rng)
+    frames = [frames[i, :lengths[i]].tobytes() for i in range(CAPTURE_FRAMES)]
+
+    write_pcap("synthetic.pcap", frames)
+    write_pcapng("synthetic.pcapng", frames)
+    for path in ("synthetic.pcap", "synthetic.pcapng"):
+        assert list(pcap.read_frames(path)) == frames, f'{path} read back differently'
+
     tb = TB(dut)
 
     cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
 
-    cocotb.start_soon(tb.toggle_byte_vld())
+    tb.domain.add_driver(tb.toggle_byte_vld)
 
     await ClockCycles(tb.dut.clk, 100)
 
-    await FallingEdge(tb.dut.byte_in_vld)
-    await cocotb.start_soon(tb.send_data(PACKET))
+    tb.domain.add_monitor(tb.crc_monitor)
+
+    await tb.domain.until(tb.dut.byte_in_vld)
+    for path in ("synthetic.pcap", "synthetic.pcapng"):
+        num_frames, num_good = await tb.replay(pcap.read_frames(path))
+        assert num_frames == CAPTURE_FRAMES
+        tb.log.info(f'Replayed {num_frames} frames from {path}, {num_good} with a good FCS')
 
     await ClockCycles(tb.dut.clk, 100)
     dut._log.info('Test done')
 
+
+@cocotb.test(skip=PCAP_FILE is None)
+async def test_pcap_replay(dut):
+    '''Replay a captured trace through crc 8'''
+
+    tb = TB(dut)
+
+    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+
+    tb.domain.add_driver(tb.toggle_byte_vld)
+
+    await ClockCycles(tb.dut.clk, 100)
+
+    tb.domain.add_monitor(tb.crc_monitor)
+
+    frames = pcap.read_frames(PCAP_FILE)
+    if not PCAP_FCS:
+        frames = (frame + crc.fcs(frame) for frame in frames)
+
+    await tb.domain.until(tb.dut.byte_in_vld)
+    num_frames, num_good = await tb.replay(frames)
+    tb.log.info(f'Replayed {num_frames} frames from {PCAP_FILE}, {num_good} with a good FCS')
+
+    await ClockCycles(tb.dut.clk, 100)
+    dut._log.info('Test done')
@@ -44,8 +44,4 @@ module delay #(
         end
     endgenerate
 
-//    initial begin
-//        $dumpfile("delay.vcd");
-//        $dumpvars();
-//    end
 endmodule
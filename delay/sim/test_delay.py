@@ -1,9 +1,60 @@
-
+import os
 import random
 import cocotb
 import logging
-from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, ClockCycles
+from test_classes import ClockDomain
+from cocotb.triggers import RisingEdge, FallingEdge, ReadOnly, ClockCycles
+
+
+NUM_CYCLES      = int(cocotb.top.NUM_CYCLES)
+WIDTH           = int(cocotb.top.WIDTH)
+RESET           = int(cocotb.top.RESET)
+RESET_POLARITY  = int(cocotb.top.RESET_POLARITY)
+NUM_WORDS       = int(os.environ.get("NUM_WORDS", 2000))
+
+
+class DelayModel():
+    def __init__(self, num_cycles, reset=0):
+        '''
+        Reference model for the delay line. The last num_cycles inputs are
+        held in a ring buffer allocated once, so every clock costs one store
+        and one load whatever the depth.
+
+        :param self: Class instance
+        :param num_cycles: Delay in clock cycles
+        :param reset: Value the registers are cleared to on reset
+        '''
+        self.num_cycles = num_cycles
+        self.reset_value = reset
+        self.ring = [0]*num_cycles
+        self.ptr = 0
+        self.valid = 0          # registers holding a known value
+
+    def reset(self):
+        '''
+        Clears every register, as the HDL does on an active reset
+        '''
+        for i in range(self.num_cycles):
+            self.ring[i] = self.reset_value
+        self.valid = self.num_cycles
+
+    def clock(self, data_in):
+        '''
+        Takes the input sampled on a clock edge and returns the output
+        expected after that edge, or None while the registers still hold
+        their power up value
+        '''
+        if not self.num_cycles:
+            return data_in
+        self.ring[self.ptr] = data_in
+        self.ptr += 1
+        if self.ptr == self.num_cycles:
+            self.ptr = 0
+        if self.valid < self.num_cycles:
+            self.valid += 1
+            if self.valid < self.num_cycles:
+                return None
+        return self.ring[self.ptr]
 
 
 class TB():
@@ -17,11 +68,49 @@ class TB():
         '''
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
+        self.model = DelayModel(NUM_CYCLES)
+        self.checked = 0
+
         self.dut.data_in.value = 0
-        self.width = int(self.dut.WIDTH)
+        self.dut.reset.value = not RESET_POLARITY
+
+        ClockDomain.start(self.dut.clk, 10)
+
+    async def run(self, num_words, reset_prob=0.0):
+        '''
+        Drives a random word every clock and checks data_out after every
+        rising edge against the model. reset is pulsed at random, which the
+        module must ignore when built without RESET.
+
+        :param self: Class instance
+        :param num_words: Number of clock cycles to drive
+        :param reset_prob: Chance of reset being active in a cycle
+        '''
+        dut = self.dut
+        model = self.model
+        data_in = 0
+        reset = 0
+
+        for _ in range(num_words):
+            await FallingEdge(dut.clk)
+            data_in = random.getrandbits(WIDTH)
+            reset = random.random() < reset_prob
+            dut.data_in.value = data_in
+            dut.reset.value = RESET_POLARITY if reset else not RESET_POLARITY
+
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if reset and RESET and NUM_CYCLES:
+                model.reset()
+                expected = model.reset_value
+            else:
+                expected = model.clock(data_in)
+
+            if expected is not None:
+                assert dut.data_out.value == expected, \
+                    f'data_out {dut.data_out.value.integer:#x}, expected {expected:#x}'
+                self.checked += 1
 
-        cocotb.start_soon(Clock(self.dut.clk, 10, units='ns').start())
 
 @cocotb.test()
 async def test_delay(dut):
@@ -29,13 +118,20 @@ async def test_delay(dut):
 
     tb = TB(dut)
 
-    await ClockCycles(tb.dut.clk, 20)
-    num_bytes = 20
+    await ClockCycles(tb.dut.clk, 2)
+    await tb.run(NUM_WORDS)
+
+    assert tb.checked >= NUM_WORDS - NUM_CYCLES
+    dut._log.info(f'{tb.checked} cycles checked')
+
 
-    for _ in range(num_bytes):
-        await RisingEdge(dut.clk)
-        dut.data_in.value = random.randint(0, 2**tb.width-1)
+@cocotb.test()
+async def test_delay_reset(dut):
+    '''Test for delay with reset asserted at random'''
+
+    tb = TB(dut)
 
-    await ClockCycles(tb.dut.clk, 20)
-    dut.log.info('Test done')
+    await ClockCycles(tb.dut.clk, 2)
+    await tb.run(NUM_WORDS, reset_prob=0.02)
 
+    dut._log.info(f'{tb.checked} cycles checked')
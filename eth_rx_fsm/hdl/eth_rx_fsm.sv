@@ -90,10 +90,5 @@ module eth_rx_fsm
         end
     end
 
-    // initial begin
-    //     $dumpfile("eth_rx_fsm.vcd");
-    //     $dumpvars();
-    // end
-
 
 endmodule
\ No newline at end of file
@@ -1,12 +1,11 @@
 
+import os
 import random
 import cocotb
 import logging
-import sys
-sys.path.append("../../../..")
-import test_classes
-from cocotb.clock import Clock
-from cocotb.queue import Queue
+import numpy as np
+from test_classes import ClockDomain, EthRxMonitor, FrameScoreboard, TraceSampler, crc, cycle_rst_n, metrics, pcap
+from test_classes.trace import rising, runs
 from cocotb.triggers import Timer, RisingEdge, ClockCycles, FallingEdge
 
 DEST    = b'\x01\x00\x5E\x28\x64\x01'
@@ -22,8 +21,17 @@ CRC     = b'\xD0\x1D\x41\x1B'
 
 PACKET = DEST+SRC+TYPE+DATA1+DATA2+DATA3+DATA4+DATA5+DATA6+CRC
 
-print(type(PACKET))
-print(PACKET)
+# Optional capture to replay, and whether its frames still carry the FCS
+PCAP_FILE   = os.getenv("PCAP_FILE")
+PCAP_FCS    = int(os.getenv("PCAP_FCS", 0))
+HDR_LEN     = 14
+
+# Random frames sent back to back, some corrupted and some runts
+NUM_FRAMES  = int(os.getenv("NUM_FRAMES", 200))
+FRAME_LEN   = int(os.getenv("FRAME_LEN", 256))
+
+# Frame length buckets for the metrics histogram, in bytes
+FRAME_EDGES = (HDR_LEN, 64, 128, 256, 512, 1024, 1519)
 
 class TB():
     def __init__(self, dut):
@@ -36,41 +44,75 @@ class TB():
         '''
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
-        self.sb = Queue()
+        self.sb = FrameScoreboard('eth')
+
+        metrics.start('eth_rx_fsm')
+        self.bytes_sent = metrics.counter('eth.bytes')
+        self.frames_sent = metrics.counter('eth.frames')
+        self.frame_len = metrics.histogram('eth.frame_bytes', FRAME_EDGES)
 
         self.dut.data_in.value = 0
         self.dut.data_in_vld.value = 0
         self.dut.byte_in_vld.value = 0
         self.dut.crc_vld.value = 0
+        self.byte_in_vld = 0
 
-        cocotb.start_soon(Clock(self.dut.clk, 10, units='ns').start())
+        self.domain = ClockDomain.start(self.dut.clk, 10)
 
-    async def send_data(self, data_in):
+        # Frame level checks run on this trace once the frames are sent
+        self.trace = TraceSampler(self.dut.clk, [self.dut.byte_in_vld, self.dut.crc_vld,
+                                                 self.dut.data_out_vld, self.dut.ctrl_vld])
 
-        for byte in data_in:
+        # Every frame is checked against sb as its ctrl word comes out
+        self.monitor = EthRxMonitor(self.dut.clk, self.dut.data_out, self.dut.data_out_vld,
+                                    self.dut.ctrl, self.dut.ctrl_vld, self.sb.check)
+
+    async def send_data(self, data_in, crc_ok=False):
+        '''
+        Sends one frame, raising crc_vld with the last byte when
+        crc_ok is set, as crc_8 would for a frame with a good FCS
+        '''
+        self.sb.put(data_in, crc_ok)
+        last = len(data_in)-1
+        for i, byte in enumerate(data_in):
             self.dut.data_in_vld.value = 1
             self.dut.data_in.value = byte
-            await FallingEdge(self.dut.byte_in_vld)
+            self.dut.crc_vld.value = int(crc_ok and i == last)
+            await self.domain.until(self.dut.byte_in_vld)
 
             self.dut.data_in_vld.value = 0
             self.dut.data_in.value = 0
+            self.dut.crc_vld.value = 0
+            self.bytes_sent.inc()
+
+        self.frames_sent.inc()
+        self.frame_len.observe(len(data_in))
+
+    async def replay(self, frames):
+        '''
+        Sends frames from an iterator one at a time, each followed by
+        an idle byte, and counts the ctrl_vld pulses they produce
+
+        :param frames: Iterator of frames including their FCS
+        '''
+        num_frames = 0
+        num_hdr = 0
+        for frame in frames:
+            await self.send_data(frame, crc.check(frame))
+            await self.domain.until(self.dut.byte_in_vld)
+            num_frames += 1
+            num_hdr += len(frame) >= HDR_LEN
+
+        return num_frames, num_hdr
 
-    async def toggle_byte_vld(self):
-        while(True):
-            await RisingEdge(self.dut.clk)
-            self.dut.byte_in_vld.value = 1
-            await RisingEdge(self.dut.clk)
-            self.dut.byte_in_vld.value = 0
+    def toggle_byte_vld(self):
+        '''
+        Driver callback, flips byte_in_vld on every rising edge
+        '''
+        self.byte_in_vld ^= 1
+        self.dut.byte_in_vld.value = self.byte_in_vld
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
  
 @cocotb.test()
@@ -81,13 +123,92 @@ async def test_test_eth_rx_fsm(dut):
 
     cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
 
-    cocotb.start_soon(tb.toggle_byte_vld())
+    tb.domain.add_driver(tb.toggle_byte_vld)
 
     await ClockCycles(tb.dut.clk, 100)
 
-    await FallingEdge(tb.dut.byte_in_vld)
+    tb.trace.start()
+    tb.monitor.start()
+    await tb.domain.until(tb.dut.byte_in_vld)
     await cocotb.start_soon(tb.send_data(PACKET))
 
     await ClockCycles(tb.dut.clk, 100)
+    tb.trace.stop()
+
+    starts, lengths = runs(tb.trace['data_out_vld'])
+    tb.log.info(f'data_out_vld high for {lengths.sum()} cycles in {len(lengths)} runs, '
+                f'ctrl_vld pulsed {len(rising(tb.trace["ctrl_vld"]))} times')
+    tb.sb.finish()
+    metrics.finish()
     dut._log.info('Test done')
 
+
+
+@cocotb.test(skip=PCAP_FILE is None)
+async def test_pcap_replay(dut):
+    '''Replay a captured trace through eth rx fsm'''
+
+    tb = TB(dut)
+
+    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+
+    tb.domain.add_driver(tb.toggle_byte_vld)
+
+    await ClockCycles(tb.dut.clk, 100)
+
+    tb.trace.start()
+    tb.monitor.start()
+
+    frames = pcap.read_frames(PCAP_FILE)
+    if not PCAP_FCS:
+        frames = (frame + crc.fcs(frame) for frame in frames)
+
+    await tb.domain.until(tb.dut.byte_in_vld)
+    num_frames, num_hdr = await tb.replay(frames)
+
+    await ClockCycles(tb.dut.clk, 10)
+    tb.trace.stop()
+    tb.log.info(f'Replayed {num_frames} frames from {PCAP_FILE}')
+
+    # Every frame long enough to carry a header ends in one ctrl word
+    ctrl = rising(tb.trace['ctrl_vld'])
+    assert len(ctrl) == num_hdr
+
+    # ctrl_vld follows the last byte of its frame, where crc_vld is raised
+    # for a good FCS
+    crc_ok = rising(tb.trace['crc_vld'])
+    tb.log.info(f'{len(ctrl)} ctrl words, {len(crc_ok)} frames with a good FCS')
+
+    tb.sb.finish()
+    metrics.finish()
+    dut._log.info('Test done')
+
+
+
+@cocotb.test()
+async def test_eth_frames(dut):
+    '''Random frames at line rate checked against the frame scoreboard'''
+
+    tb = TB(dut)
+
+    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+
+    tb.domain.add_driver(tb.toggle_byte_vld)
+
+    await ClockCycles(tb.dut.clk, 100)
+
+    rng = np.random.default_rng(cocotb.RANDOM_SEED)
+    frames, lengths = crc.random_frames(NUM_FRAMES, HDR_LEN+4, FRAME_LEN, rng)
+    frames, _ = crc.inject_bit_errors(frames, lengths, 0.1, rng)
+    runt = rng.random(NUM_FRAMES) < 0.05
+    lengths[runt] = rng.integers(1, HDR_LEN+1, size=runt.sum())
+
+    tb.monitor.start()
+    await tb.domain.until(tb.dut.byte_in_vld)
+    await tb.replay(frames[i, :lengths[i]].tobytes() for i in range(NUM_FRAMES))
+    await ClockCycles(tb.dut.clk, 10)
+
+    tb.sb.finish()
+    assert tb.sb.num_checked == NUM_FRAMES - tb.sb.num_runts
+    metrics.finish()
+    dut._log.info('Test done')
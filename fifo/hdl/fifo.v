@@ -148,10 +148,5 @@ module fifo #(
             .cnt_cmb    (rd_ptr_cmb)
         );
 
-    // initial begin
-    //     $dumpfile("fifo.vcd");
-    //     $dumpvars();
-    // end
-
 
 endmodule
\ No newline at end of file
@@ -2,18 +2,24 @@
 import random
 import cocotb
 import logging
-from cocotb.queue import Queue
-from cocotb.clock import Clock
+import numpy as np
+from test_classes import ClockDomain, FifoProbe, Scoreboard, StreamDriver, StreamMonitor, TraceSampler, TxLog, cycle_rst_n, metrics, stream
+from test_classes.trace import handshakes, runs
 from cocotb.triggers import First, RisingEdge, ClockCycles, with_timeout, Timer, FallingEdge, Combine
 
+# Edges write_fifo and read_fifo wait for a handshake, 10 us at 10 ns
+TIMEOUT     = 1000
+
 class TB():
     def __init__(self, dut):
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
-        self.sb = Queue()
+        self.sb = Scoreboard('fifo')
+        self.txlog = TxLog('fifo.txlog')
+        self.wr_ch = self.txlog.channel('wr')
+        self.rd_ch = self.txlog.channel('rd')
 
-        cocotb.start_soon(Clock(dut.clk, 10, units='ns').start())
+        self.domain = ClockDomain.start(dut.clk, 10)
         self.dut.wr_data.value = 0
         self.dut.wr_vld.value = 0
         self.dut.rd_rdy.value = 0
@@ -28,24 +34,21 @@ class TB():
         self.dut.wr_vld.value = 1
         self.dut.wr_data.value = data
 
-        await FallingEdge(self.dut.clk)
-        if (self.dut.wr_rdy != 1):
-            await First(RisingEdge(self.dut.wr_rdy), Timer(10, 'us'))
-            if (self.dut.wr_rdy != 1):
-                return
-
-        await RisingEdge(self.dut.clk)
+        done = await self.domain.until(self.dut.wr_vld, self.dut.wr_rdy, timeout=TIMEOUT)
 
         self.dut.wr_vld.value = 0
         self.dut.wr_data.value = 0
-        await self.sb.put(data)
+        if done is None:
+            return
+        self.sb.put(data)
+        self.txlog.log(self.wr_ch, data)
 
     # This method calls the write_fifo method
     # in order to fill the FIFO
     async def write_mult(self, num=1):
         for _ in range(num):
             await self.write_fifo()
-            await ClockCycles(self.dut.clk, 1)
+            await self.domain.wait(1)
 
     # This method calls the write_fifo method
     # in order to fill the FIFO
@@ -53,7 +56,8 @@ class TB():
         for _ in range(num):
             delay = random.randint(0,wait)
             await self.write_fifo()
-            await ClockCycles(self.dut.clk, delay)
+            if delay:
+                await self.domain.wait(delay)
 
     # This method calls the write_fifo method
     # in order to fill the FIFO
@@ -65,58 +69,49 @@ class TB():
 
         self.dut.rd_rdy.value = 1
 
-        await FallingEdge(self.dut.clk)
-
-        if (self.dut.rd_vld != 1):
-            await First(RisingEdge(self.dut.rd_vld), Timer(10, 'us'))
-            if (self.dut.rd_vld != 1):
-                 return 0
-
-        rd_data = self.dut.rd_data
-        await RisingEdge(self.dut.clk)
+        rd_data = await self.domain.until(self.dut.rd_vld, self.dut.rd_rdy,
+                                          sample=self.dut.rd_data, timeout=TIMEOUT)
         self.dut.rd_rdy.value = 0
+        if rd_data is None:
+            return 0
+
+        self.txlog.log(self.rd_ch, rd_data)
+        self.sb.check(rd_data)
 
-        sb_data = await with_timeout(self.sb.get(), 10, 'us')
-        print(f'{int(rd_data)} = {sb_data}')
-        assert rd_data == sb_data
+    # This method waits for the FIFO to hold a word
+    async def wait_rd_vld(self):
+        if (self.dut.rd_vld != 1):
+            assert await self.domain.until(self.dut.rd_vld, timeout=TIMEOUT), 'rd_vld never rose'
 
     # This method repeatedly calls read_fifo
     async def read_mult(self, num=1):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         for _ in range(num):
             await self.read_fifo()
 
     # This method repeatedly calls read_fifo
     async def read_mult_delay(self, num=1, wait=15):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         for _ in range(num):
             delay = random.randint(0,wait)
             await self.read_fifo()
-            await ClockCycles(self.dut.clk, delay)
+            if delay:
+                await self.domain.wait(delay)
 
     # This method repeatedly calls read_fifo until
     # the FIFO is empty
     async def empty_fifo(self):
-        if (self.dut.rd_vld != 1):
-            await with_timeout(RisingEdge(self.dut.rd_vld), 10, 'us')
+        await self.wait_rd_vld()
 
         while self.dut.rd_vld == 1:
             await self.read_fifo()
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
 NUM_LOOPS   = 100
+NUM_STREAM  = 2000
 
 # Declare parameter values
 FIFO_DEPTH = int(cocotb.top.P_DEPTH)
@@ -135,19 +130,95 @@ async def test_fifo(dut):
     # Declare testbench and scoreboard
     tb = TB(dut)
 
-    # Reset design
-    cocotb.start_soon(cycle_rst_n(dut.rst_n, dut.clk))
+    try:
+        # Reset design
+        cocotb.start_soon(cycle_rst_n(dut.rst_n, dut.clk))
 
-    # Wait some arbitrary time
-    await ClockCycles(dut.clk, 100)
+        # Wait some arbitrary time
+        await ClockCycles(dut.clk, 100)
+        probe = FifoProbe(dut.clk, dut.wr_vld, dut.wr_rdy, dut.clk, dut.rd_vld, dut.rd_rdy, 'fifo')
 
-    # write_task = cocotb.start_soon(tb.write_mult_delay(NUM_LOOPS))
-    # read_task = cocotb.start_soon(tb.read_mult_delay(NUM_LOOPS))
-    # done = Combine(write_task, read_task)
-    # await First(done, Timer(50, 'us'))
+        # write_task = cocotb.start_soon(tb.write_mult_delay(NUM_LOOPS))
+        # read_task = cocotb.start_soon(tb.read_mult_delay(NUM_LOOPS))
+        # done = Combine(write_task, read_task)
+        # await First(done, Timer(50, 'us'))
 
-    await tb.write_mult(50)
+        await tb.write_mult(50)
+        await tb.empty_fifo()
 
-    await ClockCycles(dut.clk, 100)
+        await ClockCycles(dut.clk, 100)
+    finally:
+        tb.txlog.close()
+    probe.export()
+    tb.sb.finish()
     dut._log.info('Test done')
 
+
+
+async def stream_words(tb, pattern_wr=None, pattern_rd=None, name='stream'):
+    '''
+    Streams NUM_STREAM random words through the fifo and waits
+    until every one of them has been read back and checked
+    '''
+    dut = tb.dut
+    metrics.start(name)
+    trace = TraceSampler(dut.clk, [dut.wr_data, dut.wr_vld, dut.wr_rdy, dut.rd_data, dut.rd_vld, dut.rd_rdy])
+    trace.start()
+    probe = FifoProbe(dut.clk, dut.wr_vld, dut.wr_rdy, dut.clk, dut.rd_vld, dut.rd_rdy, name)
+    wr = StreamDriver(dut.clk, dut.wr_data, dut.wr_vld, dut.wr_rdy,
+                      pattern=pattern_wr, callback=tb.sb.put, name='wr')
+    rd = StreamMonitor(dut.clk, dut.rd_data, dut.rd_vld, dut.rd_rdy,
+                       pattern=pattern_rd, callback=tb.sb.check, name='rd')
+
+    wr.send([random.randint(0, 2**FIFO_WIDTH-1) for _ in range(NUM_STREAM)])
+    await with_timeout(wr.wait(), 1000, 'us')
+    # Each word left in the fifo must be read within TIMEOUT edges of the last
+    pending, idle = len(tb.sb), 0
+    while pending and idle < TIMEOUT:
+        await tb.domain.wait()
+        idle = idle + 1 if len(tb.sb) == pending else 0
+        pending = len(tb.sb)
+    assert not pending, f'{name}: {pending} words never read back'
+
+    trace.stop()
+
+    tb.log.info(str(wr.stats))
+    tb.log.info(str(rd.stats))
+    probe.export()
+    tb.sb.finish()
+
+    # The whole stream again, checked from the trace in one pass
+    writes = handshakes(trace['wr_vld'], trace['wr_rdy'])
+    reads = handshakes(trace['rd_vld'], trace['rd_rdy'])
+    assert len(writes) == len(reads) == NUM_STREAM
+    assert np.array_equal(trace['wr_data'][writes], trace['rd_data'][reads])
+    _, full = runs(~trace['wr_rdy'])
+    tb.log.info(f'{name}: {len(trace)} cycles traced, full {full.sum()} cycles '
+                f'in {len(full)} runs, longest {full.max(initial=0)}')
+    metrics.finish()
+    return wr.stats, rd.stats
+
+
+@cocotb.test()
+async def test_fifo_throughput(dut):
+    """Back to back writes and reads must sustain one word per clock"""
+
+    tb = TB(dut)
+    cocotb.start_soon(cycle_rst_n(dut.rst_n, dut.clk))
+    await ClockCycles(dut.clk, 10)
+
+    wr_stats, rd_stats = await stream_words(tb, name='throughput')
+
+    assert wr_stats.sustained() >= 0.99
+    assert rd_stats.sustained() >= 0.99
+
+
+@cocotb.test()
+async def test_fifo_bursty(dut):
+    """Random idle cycles on the write side and backpressure on the read side"""
+
+    tb = TB(dut)
+    cocotb.start_soon(cycle_rst_n(dut.rst_n, dut.clk))
+    await ClockCycles(dut.clk, 10)
+
+    await stream_words(tb, stream.random_pattern(0.7), stream.burst(3, 2), 'bursty')
@@ -0,0 +1,7 @@
+from .blocks import Block, ROOT, discover_blocks
+from .cache import BuildCache
+from .runner import (BUILD_DIR, CACHE_DIR, Job, Result, format_comparison, format_results, make_jobs,
+                     run_job, run_jobs, simulator_class)
+from .simulators import BUILD_ARGS, build_args
+from .sweep import SWEEPS, TB_SWEEPS, grid, parse_axis, sample, write_csv
+from .waves import Waves, parse_window, save_file, wave_file
@@ -0,0 +1,71 @@
+import re
+from collections import namedtuple
+from glob import glob
+from os.path import abspath, basename, dirname, isdir, join, relpath, splitext
+
+
+##########################################
+##           BLOCK DISCOVERY            ##
+##########################################
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+HDL_EXTS = (".v", ".sv")
+TEST_DIRS = ("test", "sim")
+
+_module_re = re.compile(r"^\s*module\s+(\w+)", re.MULTILINE)
+
+# A block is one HDL toplevel together with the cocotb modules that test it.
+# The toplevel name is unique across the repo, so it doubles as the block name.
+Block = namedtuple("Block", ["name", "path", "toplevel", "sources", "test_dir", "modules"])
+
+
+def hdl_modules(sources):
+    '''
+    Returns the set of module names declared in the given HDL files
+
+    :param sources: List of Verilog/SystemVerilog files
+    '''
+    names = set()
+    for source in sources:
+        with open(source) as f:
+            names.update(_module_re.findall(f.read()))
+    return names
+
+
+def discover_blocks(root=ROOT):
+    '''
+    Walks the tree for every hdl/ directory and pairs it with the test_*.py
+    modules in the sibling test/ or sim/ directory. The toplevel is taken from
+    the module name (test_fifo -> fifo) and must be declared in the HDL.
+
+    :param root: Directory to search from
+    '''
+    blocks = {}
+    for hdl_dir in sorted(glob(join(root, "**", "hdl"), recursive=True)):
+        block_dir = dirname(hdl_dir)
+        sources = sorted(f for f in glob(join(hdl_dir, "*")) if f.endswith(HDL_EXTS))
+        if not sources:
+            continue
+        declared = hdl_modules(sources)
+
+        for test_dir in (join(block_dir, d) for d in TEST_DIRS):
+            if not isdir(test_dir):
+                continue
+            for test_file in sorted(glob(join(test_dir, "test_*.py"))):
+                module = splitext(basename(test_file))[0]
+                toplevel = module[len("test_"):]
+                if toplevel not in declared:
+                    continue
+                if toplevel in blocks:
+                    blocks[toplevel].modules.append(module)
+                    continue
+                blocks[toplevel] = Block(
+                    name=toplevel,
+                    path=relpath(block_dir, root),
+                    toplevel=toplevel,
+                    sources=sources,
+                    test_dir=test_dir,
+                    modules=[module])
+
+    return [blocks[name] for name in sorted(blocks)]
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from contextlib import contextmanager
+from functools import lru_cache
+from os.path import basename, isdir, join
+
+import cocotb
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+##########################################
+##           BUILD CACHE                ##
+##########################################
+
+VERSION_COMMANDS = {
+    "icarus": ["iverilog", "-V"],
+    "verilator": ["verilator", "--version"],
+}
+
+# Files the simulator writes while running that must not end up in the cache
+RUN_ARTIFACTS = ("sim.log", "*_results.xml", "results.xml", "*.vcd", "*.fst", "metrics.json",
+                 "*_stats.json", "*_stats.csv", "*.txlog", "*.jsonl", "*.pcap", "*.pcapng")
+
+
+@lru_cache(maxsize=None)
+def simulator_version(simulator):
+    '''
+    Returns the first line the simulator prints for its version, or an
+    empty string if the simulator cannot be queried
+
+    :param simulator: Simulator name as passed to cocotb-test
+    '''
+    cmd = VERSION_COMMANDS.get(simulator, [simulator, "-version"])
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    lines = (out.stdout or out.stderr).strip().splitlines()
+    return lines[0] if lines else ""
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class BuildCache():
+    def __init__(self, path, max_bytes=2 << 30):
+        '''
+        Content-addressed store of compiled simulation builds. Each entry is a
+        copy of a sim_build directory after compilation, named by a hash of
+        everything that went into the build. Entries are evicted least
+        recently used first once the cache grows past max_bytes.
+
+        :param self: Class instance
+        :param path: Directory holding the cache entries
+        :param max_bytes: Size bound for the whole cache
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def key(self, simulator, toplevel, sources, defines=None, parameters=None, compile_args=None):
+        '''
+        Returns the hash of the HDL sources, defines, parameters, compile
+        arguments and simulator/cocotb versions that determine a build
+        '''
+        h = hashlib.sha256()
+        h.update(json.dumps({
+            "simulator": simulator,
+            "simulator_version": simulator_version(simulator),
+            "cocotb": cocotb.__version__,
+            "toplevel": toplevel,
+            "sources": [basename(s) for s in sources],
+            "defines": sorted(defines or []),
+            "parameters": sorted((k, str(v)) for k, v in (parameters or {}).items()),
+            "compile_args": list(compile_args or []),
+        }, sort_keys=True).encode())
+        for source in sources:
+            with open(source, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        return h.hexdigest()
+
+    @contextmanager
+    def lock(self, key):
+        '''
+        Holds an exclusive lock on key across processes, so that jobs run
+        in separate processes (e.g. pytest-xdist workers) wait for one of
+        them to compile the build instead of all compiling it. Without
+        fcntl the lock is a no-op and concurrent builds fall back on the
+        race handling in store.
+        '''
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(join(self.path, f".{key}.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def restore(self, key, sim_build):
+        '''
+        Copies a cached build into sim_build. Returns False on a miss.
+        The files are copied without their timestamps so the simulator sees
+        the image as newer than the sources and does not rebuild it.
+        '''
+        entry = join(self.path, key)
+        if not isdir(entry):
+            return False
+        try:
+            os.utime(entry)
+            shutil.copytree(entry, sim_build, dirs_exist_ok=True, copy_function=shutil.copy)
+        except (OSError, shutil.Error):
+            return False
+        return True
+
+    def store(self, key, sim_build):
+        '''
+        Adds a freshly compiled sim_build to the cache and evicts old
+        entries. Concurrent jobs building the same key are harmless: the
+        entry is staged under a temporary name and renamed into place, and
+        whichever job loses the race drops its copy.
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        entry = join(self.path, key)
+        staging = join(self.path, f".{key}.{os.getpid()}")
+        shutil.copytree(sim_build, staging, ignore=shutil.ignore_patterns(*RUN_ARTIFACTS))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes least recently used entries until the cache fits in max_bytes
+        '''
+        try:
+            names = [n for n in os.listdir(self.path) if not n.startswith(".")]
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            entry = join(self.path, name)
+            try:
+                entries.append((os.path.getmtime(entry), _dir_size(entry), entry))
+            except OSError:
+                pass
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
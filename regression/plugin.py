@@ -0,0 +1,80 @@
+from os.path import join
+
+import pytest
+
+from .blocks import discover_blocks
+from .cache import BuildCache
+from .runner import BUILD_DIR, CACHE_DIR, make_jobs, point_dir
+from .sweep import SWEEPS, TB_SWEEPS, grid
+
+
+##########################################
+##           PYTEST OPTIONS             ##
+##########################################
+
+# pytest runs build under their own root, apart from run.py
+PYTEST_BUILD_DIR = join(BUILD_DIR, "pytest")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("regression", "cocotb block regression")
+    group.addoption("--sim", default=None,
+                    help="simulator to use (default: $SIM or icarus)")
+    group.addoption("--block", action="append", default=None,
+                    help="only run the named block (repeatable)")
+    group.addoption("--sweep", action="store_true",
+                    help="run each block across its default parameter grid")
+    group.addoption("--tb-sweep", action="store_true",
+                    help="run each block across its default testbench knob grid")
+    group.addoption("--threads", type=int, default=None,
+                    help="build a multithreaded model with this many threads (Verilator only)")
+    group.addoption("--no-build-cache", action="store_true",
+                    help="always compile instead of reusing cached builds")
+
+
+def regression_jobs(config):
+    '''
+    Returns the jobs selected by the command line options. The order and
+    names only depend on the tree, so every xdist worker collects the same
+    cases.
+    '''
+    blocks = discover_blocks()
+    if config.getoption("block"):
+        blocks = [b for b in blocks if b.name in config.getoption("block")]
+
+    points = {}
+    env = set()
+    for block in blocks:
+        axes = dict(SWEEPS.get(block.name, {})) if config.getoption("sweep") else {}
+        if config.getoption("tb_sweep"):
+            axes.update(TB_SWEEPS.get(block.name, {}))
+            env.update(TB_SWEEPS.get(block.name, {}))
+        if axes:
+            points[block.name] = grid(axes)
+
+    return make_jobs(blocks, PYTEST_BUILD_DIR, simulator=config.getoption("sim"), points=points,
+                     env=env, threads=config.getoption("threads"))
+
+
+def job_id(job):
+    point = point_dir({**job.parameters, **job.env})
+    return f"{job.block.name}/{job.module}" + (f"/{point}" if point else "")
+
+
+def pytest_generate_tests(metafunc):
+    if "job" in metafunc.fixturenames:
+        jobs = regression_jobs(metafunc.config)
+        metafunc.parametrize("job", jobs, ids=[job_id(j) for j in jobs])
+
+
+@pytest.fixture(scope="session")
+def build_cache(request):
+    '''
+    Build cache shared by every case in the session. Each HDL
+    configuration is compiled by the first case that needs it and restored
+    by the rest, across xdist workers as well, since the cache lives on
+    disk and locks each build while it is compiled.
+    '''
+    if request.config.getoption("no_build_cache"):
+        return None
+    return BuildCache(CACHE_DIR)
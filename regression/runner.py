@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os.path import join
+
+import cocotb_test.simulator
+
+from .blocks import ROOT
+from .simulators import build_args, merge_kwargs
+from .waves import wave_kwargs
+
+
+##########################################
+##              JOBS                    ##
+##########################################
+
+BUILD_DIR = join(ROOT, "sim_build")
+CACHE_DIR = join(BUILD_DIR, "cache")
+
+# Written by test_classes.results in the sim_build directory
+METRICS_FILE = "metrics.json"
+
+# One simulator invocation: a block, one of its test modules and the
+# directory it builds and runs in. Every job gets its own sim_build so
+# that jobs can run side by side without clobbering each other.
+# parameters are HDL parameter overrides, env holds testbench knobs passed
+# as environment variables, which do not change the build. waves is None
+# for no waveform dump, which is the default. threads sets the number of
+# model threads for simulators that compile a multithreaded model.
+Job = namedtuple("Job", ["block", "module", "sim_build", "simulator", "cache", "parameters", "env",
+                         "waves", "threads"],
+                 defaults=[None, None, {}, {}, None, None])
+# build_time is the part of runtime spent compiling, zero on a cache hit
+Result = namedtuple("Result", ["job", "passed", "runtime", "log_file", "error", "cached", "metrics",
+                               "build_time"],
+                    defaults=[False, {}, 0.0])
+
+
+def point_dir(parameters):
+    return "_".join(f"{k}-{v}" for k, v in parameters.items())
+
+
+def make_jobs(blocks, build_dir=BUILD_DIR, simulator=None, cache=None, points=None, env=(),
+              waves=None, threads=None):
+    '''
+    Expands each block into one job per test module and parameter point
+
+    :param blocks: Blocks returned by discover_blocks
+    :param build_dir: Root directory for the per-job build directories
+    :param simulator: Simulator name, None for $SIM or icarus
+    :param cache: BuildCache shared by the jobs, None to always compile
+    :param points: Dict of block name to a list of parameter dicts. Blocks
+                   not listed are built once with the HDL defaults.
+    :param env: Names in the points that are testbench knobs rather than
+                HDL parameters
+    :param waves: Waves settings to dump every job with, None for no dumps
+    :param threads: Model threads for simulators that support them
+    '''
+    jobs = []
+    for block in blocks:
+        for point in (points or {}).get(block.name, [{}]):
+            parameters = {k: v for k, v in point.items() if k not in env}
+            knobs = {k: str(v) for k, v in point.items() if k in env}
+            for module in block.modules:
+                sim_build = join(build_dir, block.name, module)
+                if point:
+                    sim_build = join(sim_build, point_dir(point))
+                jobs.append(Job(block, module, sim_build, simulator, cache, parameters, knobs,
+                                waves, threads))
+    return jobs
+
+
+def read_metrics(sim_build):
+    try:
+        with open(join(sim_build, METRICS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def simulator_class(name, prebuilt=False):
+    '''
+    Returns the cocotb-test simulator class for the given name. A prebuilt
+    class only issues the final run command, for a sim_build that already
+    holds a compiled image.
+
+    :param name: Simulator name (icarus, verilator, questa, ...)
+    :param prebuilt: Skip the compile commands
+    '''
+    # Class names vary in case between cocotb-test versions (ActiveHdl,
+    # Activehdl), so match them without case
+    classes = {n.lower(): c for n, c in vars(cocotb_test.simulator).items()
+               if isinstance(c, type) and issubclass(c, cocotb_test.simulator.Simulator)
+               and c is not cocotb_test.simulator.Simulator}
+    cls = classes.get(name.lower())
+    if cls is None:
+        raise NotImplementedError(f"Unsupported simulator: {name}")
+    if not prebuilt:
+        return cls
+
+    class Prebuilt(cls):
+        def build_command(self):
+            return super().build_command()[-1:]
+
+    return Prebuilt
+
+
+def run_job(job):
+    '''
+    Builds and runs a single job. The simulator output goes to sim.log in
+    the job's sim_build directory rather than the console so that parallel
+    jobs do not interleave.
+
+    :param job: Job to run
+    '''
+    os.makedirs(job.sim_build, exist_ok=True)
+    log_file = join(job.sim_build, "sim.log")
+    if os.path.exists(join(job.sim_build, METRICS_FILE)):
+        os.remove(join(job.sim_build, METRICS_FILE))
+
+    logger = logging.getLogger("cocotb")
+    handler = logging.FileHandler(log_file, mode="w")
+    handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    propagate = logger.propagate
+    logger.propagate = False
+
+    simulator = job.simulator or os.getenv("SIM", "icarus")
+    kwargs = dict(
+        verilog_sources=job.block.sources,
+        toplevel=job.block.toplevel,
+        module=job.module,
+        python_search=[job.block.test_dir, ROOT],
+        sim_build=job.sim_build,
+        parameters=job.parameters,
+        compile_args=build_args(simulator, job.block.name, job.threads),
+        extra_env=job.env,
+        waves=False,
+    )
+
+    error = None
+    cached = False
+    build_time = 0.0
+    start = time.perf_counter()
+    try:
+        # Dumping is only ever switched on by the job, never by $WAVES
+        waves = wave_kwargs(simulator, job.block.toplevel, job.sim_build, job.waves)
+        kwargs["verilog_sources"] = job.block.sources + waves.pop("extra_sources", [])
+        merge_kwargs(kwargs, waves)
+
+        # Compiled separately from the run so the two can be timed apart
+        if job.cache is None:
+            simulator_class(simulator)(compile_only=True, **kwargs).run()
+            build_time = time.perf_counter() - start
+        else:
+            key = job.cache.key(simulator, job.block.toplevel, kwargs["verilog_sources"],
+                                parameters=job.parameters, compile_args=kwargs.get("compile_args"))
+            with job.cache.lock(key):
+                cached = job.cache.restore(key, job.sim_build)
+                if not cached:
+                    simulator_class(simulator)(compile_only=True, force_compile=True, **kwargs).run()
+                    build_time = time.perf_counter() - start
+                    job.cache.store(key, job.sim_build)
+        simulator_class(simulator, prebuilt=True)(**kwargs).run()
+    except (Exception, SystemExit) as e:
+        error = str(e) or type(e).__name__
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = propagate
+        handler.close()
+
+    return Result(job, error is None, time.perf_counter() - start, log_file, error, cached,
+                  read_metrics(job.sim_build), build_time)
+
+
+##########################################
+##              POOL                    ##
+##########################################
+
+def run_jobs(jobs, num_workers=None, callback=None):
+    '''
+    Runs the jobs on a process pool and returns their results in the order
+    the jobs were given
+
+    :param jobs: Jobs to run
+    :param num_workers: Pool size, defaults to the number of CPUs
+    :param callback: Called with each Result as it completes
+    '''
+    results = {}
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if callback is not None:
+                callback(result)
+
+    return [results[i] for i in range(len(jobs))]
+
+
+def format_results(results):
+    '''
+    Returns the results as a fixed-width text table
+
+    :param results: Results returned by run_jobs
+    '''
+    swept = any(r.job.parameters or r.job.env for r in results)
+    measured = any(r.metrics for r in results)
+    rows = [("BLOCK", "MODULE") + (("PARAMETERS",) if swept else ()) + ("STATUS", "BUILD", "TIME (s)")
+            + (("METRICS",) if measured else ())]
+    for r in results:
+        point = {**r.job.parameters, **r.job.env}
+        params = (" ".join(f"{k}={v}" for k, v in point.items()),) if swept else ()
+        metrics = (" ".join(f"{k}={v}" for k, v in r.metrics.items()),) if measured else ()
+        rows.append((r.job.block.name, r.job.module) + params
+                    + ("PASS" if r.passed else "FAIL", "cached" if r.cached else "compiled",
+                       f"{r.runtime:.2f}") + metrics)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(col.ljust(w) for col, w in zip(row, widths)) for row in rows)
+
+
+
+def format_comparison(results, simulators):
+    '''
+    Returns a fixed-width table setting the same jobs run under each
+    simulator side by side. Build and run wall times are shown apart, and
+    the speedup is the run time under the first simulator over the run
+    time under each of the others.
+
+    :param results: Results returned by run_jobs for jobs made once per
+                    simulator
+    :param simulators: Simulator names, the first being the baseline
+    '''
+    runs = {}
+    for r in results:
+        point = tuple({**r.job.parameters, **r.job.env}.items())
+        runs.setdefault((r.job.block.name, r.job.module, point), {})[r.job.simulator] = r
+
+    swept = any(point for _, _, point in runs)
+    rows = [("BLOCK", "MODULE") + (("PARAMETERS",) if swept else ())
+            + tuple(f"{sim.upper()} {col}" for sim in simulators for col in ("STATUS", "BUILD (s)", "RUN (s)"))
+            + tuple(f"SPEEDUP {sim}" for sim in simulators[1:])]
+    for (block, module, point), by_sim in runs.items():
+        row = (block, module) + ((" ".join(f"{k}={v}" for k, v in point),) if swept else ())
+        for sim in simulators:
+            r = by_sim.get(sim)
+            row += ("PASS" if r.passed else "FAIL", f"{r.build_time:.2f}",
+                    f"{r.runtime - r.build_time:.2f}") if r else ("-", "-", "-")
+        base = by_sim.get(simulators[0])
+        for sim in simulators[1:]:
+            r = by_sim.get(sim)
+            # Failed runs stop early, so their times are not comparable
+            if base and r and base.passed and r.passed and r.runtime > r.build_time:
+                row += (f"{(base.runtime - base.build_time) / (r.runtime - r.build_time):.2f}x",)
+            else:
+                row += ("-",)
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(col.ljust(w) for col, w in zip(row, widths)) for row in rows)
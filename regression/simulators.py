@@ -0,0 +1,61 @@
+import os
+
+
+##########################################
+##           BUILD FLAGS                ##
+##########################################
+
+# Extra compile arguments per simulator, keyed by block name. Verilator
+# lints far harder than Icarus and stops on its first warning, so each
+# block waives only the warnings its HDL is known to raise.
+BUILD_ARGS = {
+    "verilator": {
+        "async_fifo": ["-Wno-PINMISSING"],
+        "fifo": ["-Wno-PINMISSING"],
+        "axil_slave_if": ["-Wno-WIDTHEXPAND"],
+        "seven_segment_display": ["-Wno-WIDTHTRUNC"],
+        "uart_receiver": ["-Wno-WIDTHEXPAND", "-Wno-CASEINCOMPLETE"],
+        "uart_transmitter": ["-Wno-WIDTHEXPAND", "-Wno-WIDTHTRUNC", "-Wno-CASEINCOMPLETE"],
+    },
+}
+
+# Simulators whose compiled model can be built multithreaded
+THREADED = ("verilator",)
+
+
+def build_args(simulator, block, threads=None):
+    '''
+    Returns the compile arguments for building block with the simulator
+
+    :param simulator: Simulator name
+    :param block: Block name
+    :param threads: Number of model threads, None for the simulator
+                    default. Ignored by simulators that are not THREADED.
+                    Capped at the CPUs this process may run on, since a
+                    Verilator model refuses to start with more threads
+                    than its context, which defaults to that count.
+    '''
+    args = list(BUILD_ARGS.get(simulator, {}).get(block, []))
+    if threads and simulator in THREADED:
+        args += ["--threads", str(min(threads, available_cpus()))]
+    return args
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def merge_kwargs(kwargs, extra):
+    '''
+    Adds extra cocotb-test arguments to kwargs, appending to argument
+    lists already set instead of replacing them
+    '''
+    for name, value in extra.items():
+        if isinstance(value, list) and name in kwargs:
+            kwargs[name] = kwargs[name] + value
+        else:
+            kwargs[name] = value
+    return kwargs
@@ -0,0 +1,114 @@
+import csv
+import itertools
+import random
+
+
+##########################################
+##           PARAMETER SWEEPS           ##
+##########################################
+
+# Default sweep grid for each block, keyed by block name. Every point is
+# a set of HDL parameter overrides; the HDL default is used for anything
+# not listed.
+SWEEPS = {
+    "fifo": {
+        "P_DEPTH": [16, 64, 1024],
+        "P_WIDTH": [8, 16, 32],
+    },
+    "async_fifo": {
+        "P_DEPTH": [16, 64, 1024],
+        "P_WIDTH": [8, 16, 32],
+    },
+    "uart_transmitter": {
+        "P_BAUD_RATE": [9600, 115200, 921600],
+        "P_NUM_STOP": [1, 2],
+        "P_PARITY": [0, 1, 2],
+    },
+    "uart_receiver": {
+        "P_BAUD_RATE": [9600, 115200, 921600],
+        "P_NUM_STOP": [1, 2],
+        "P_PARITY": [0, 1, 2],
+    },
+    "delay": {
+        "NUM_CYCLES": [0, 1, 6, 32, 256],
+        "WIDTH": [1, 14, 64, 512],
+        "RESET": [0, 1],
+        "RESET_POLARITY": [0, 1],
+    },
+}
+
+
+# Testbench knobs swept the same way but passed to the simulation as
+# environment variables, so every point reuses one compiled build. The
+# async_fifo clocks run fast to slow and slow to fast, with the read clock
+# started at several phase offsets and every edge jittered (all in ns).
+TB_SWEEPS = {
+    "async_fifo": {
+        "WR_PRD": [2, 3, 10, 34],
+        "RD_PRD": [2, 3, 10, 34],
+        "RD_PHASE": [0, 0.3, 1.1],
+        "JITTER": [0, 0.2],
+    },
+}
+
+
+def grid(axes):
+    '''
+    Returns every combination of the parameter values as a list of dicts
+
+    :param axes: Dict of parameter name to list of values
+    '''
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def sample(axes, num, seed=None):
+    '''
+    Returns num distinct points drawn at random from the parameter grid,
+    or the whole grid if it has num points or fewer
+
+    :param axes: Dict of parameter name to list of values
+    :param num: Number of points to draw
+    :param seed: Seed for the random draw
+    '''
+    points = grid(axes)
+    if num >= len(points):
+        return points
+    return random.Random(seed).sample(points, num)
+
+
+def parse_axis(text):
+    '''
+    Parses a NAME=v1,v2,... command line argument into (name, values)
+
+    :param text: Argument text
+    '''
+    name, sep, values = text.partition("=")
+    if not sep or not name or not values:
+        raise ValueError(f"Expected NAME=v1,v2,... but got '{text}'")
+    return name.strip(), [v.strip() for v in values.split(",")]
+
+
+def write_csv(results, path):
+    '''
+    Writes one row per result with a column for every swept parameter
+
+    :param results: Results returned by run_jobs
+    :param path: Output file
+    '''
+    names = []
+    metrics = []
+    for r in results:
+        names += [n for n in {**r.job.parameters, **r.job.env} if n not in names]
+        metrics += [m for m in r.metrics if m not in metrics]
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["block", "module"] + names + ["status", "build", "runtime_s"] + metrics)
+        for r in results:
+            point = {**r.job.parameters, **r.job.env}
+            writer.writerow([r.job.block.name, r.job.module]
+                            + [point.get(n, "") for n in names]
+                            + ["PASS" if r.passed else "FAIL",
+                               "cached" if r.cached else "compiled", f"{r.runtime:.3f}"]
+                            + [r.metrics.get(m, "") for m in metrics])
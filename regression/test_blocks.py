@@ -0,0 +1,12 @@
+from .runner import run_job
+
+
+def test_block(job, build_cache, record_property):
+    '''
+    Runs one cocotb module of a block, at one parameter point, in its own
+    build directory
+    '''
+    result = run_job(job._replace(cache=build_cache))
+    for name, value in result.metrics.items():
+        record_property(name, value)
+    assert result.passed, f"{result.error}, see {result.log_file}"
@@ -0,0 +1,111 @@
+from collections import namedtuple
+from os.path import isfile, join
+
+
+##########################################
+##           WAVEFORM DUMPS             ##
+##########################################
+
+# Waveform dump settings for a job. start/stop limit dumping to a window of
+# simulation time in ns, scope to one instance (e.g. async_fifo.wr_ctr) and
+# depth to that many levels below it, 0 for all.
+Waves = namedtuple("Waves", ["format", "start", "stop", "scope", "depth"],
+                   defaults=["fst", None, None, None, 0])
+
+FORMATS = ("fst", "vcd")
+DUMP_MODULE = "waves_dump"
+
+
+def parse_window(text):
+    '''
+    Parses a START:STOP command line argument in ns, either end optional
+
+    :param text: Argument text
+    '''
+    start, sep, stop = text.partition(":")
+    if not sep:
+        raise ValueError(f"Expected START:STOP but got '{text}'")
+    return (float(start) if start else None), (float(stop) if stop else None)
+
+
+def wave_file(sim_build, toplevel, waves):
+    return join(sim_build, f"{toplevel}.{waves.format}")
+
+
+def save_file(block, simulator):
+    '''
+    Returns the block's GTKWave save file, or None. Signals in the save
+    files are named from the toplevel down, which only matches the Icarus
+    dumps. Verilator roots its trace at TOP above the toplevel, so there
+    is no save file for its jobs.
+
+    :param block: Block the job ran
+    :param simulator: Simulator the job ran on
+    '''
+    if simulator != "icarus":
+        return None
+    path = join(block.test_dir, f"{block.toplevel}.gtkw")
+    return path if isfile(path) else None
+
+
+def dump_module(toplevel, waves):
+    '''
+    Returns the source of a second toplevel module that dumps the design,
+    for simulators that elaborate more than one top
+    '''
+    lines = [
+        "`timescale 1ns / 1ps",
+        f"module {DUMP_MODULE}();",
+        "    initial begin",
+        f'        $dumpfile("{toplevel}.{waves.format}");',
+        f"        $dumpvars({waves.depth}, {waves.scope or toplevel});",
+    ]
+    if waves.start:
+        lines += ["        $dumpoff;", f"        #{waves.start} $dumpon;"]
+    if waves.stop is not None:
+        lines += [f"        #{waves.stop - (waves.start or 0)} $dumpoff;"]
+    lines += ["    end", "endmodule", ""]
+    return "\n".join(lines)
+
+
+def wave_kwargs(simulator, toplevel, sim_build, waves):
+    '''
+    Returns the extra cocotb-test arguments that make the simulator dump
+    waves to <toplevel>.fst or <toplevel>.vcd in sim_build, or an empty
+    dict when waves is None
+
+    :param simulator: Simulator name
+    :param toplevel: Toplevel module
+    :param sim_build: Job build directory
+    :param waves: Waves settings
+    '''
+    if waves is None:
+        return {}
+    if waves.format not in FORMATS:
+        raise ValueError(f"Unknown waveform format: {waves.format}")
+
+    if simulator == "icarus":
+        source = join(sim_build, f"{DUMP_MODULE}.v")
+        text = dump_module(toplevel, waves)
+        if not isfile(source) or open(source).read() != text:
+            with open(source, "w") as f:
+                f.write(text)
+        return dict(extra_sources=[source],
+                    compile_args=["-s", DUMP_MODULE],
+                    plus_args=["-fst"] if waves.format == "fst" else [])
+
+    if simulator == "verilator":
+        # Verilator elaborates a single top and traces from its own main
+        # loop, so the whole design is dumped and only the depth applies
+        if waves.start is not None or waves.stop is not None or waves.scope:
+            raise ValueError("Verilator dumps cannot be limited to a time window or scope")
+        trace = ["--trace-fst"] if waves.format == "fst" else ["--trace"]
+        if waves.depth:
+            trace += ["--trace-depth", str(waves.depth)]
+        return dict(compile_args=trace,
+                    plus_args=["--trace", "--trace-file", f"{toplevel}.{waves.format}"])
+
+    # Anything else falls back on the simulator's own full-design dump
+    if waves.start is not None or waves.stop is not None or waves.scope:
+        raise ValueError(f"{simulator} dumps cannot be limited to a time window or scope")
+    return dict(waves=True)
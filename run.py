@@ -0,0 +1,143 @@
+import argparse
+import sys
+import time
+from os.path import join
+
+from regression import (BUILD_DIR, CACHE_DIR, SWEEPS, TB_SWEEPS, BuildCache, Waves, discover_blocks,
+                        format_comparison, format_results, grid, make_jobs, parse_axis, parse_window,
+                        run_jobs, sample, save_file, wave_file, write_csv)
+
+
+##########################################
+##           TEST SETUP                 ##
+##########################################
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the cocotb regression for every block")
+    parser.add_argument("-b", "--block", action="append",
+                        help="only run the named block (repeatable)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of parallel jobs (default: number of CPUs)")
+    parser.add_argument("--sim", default=None,
+                        help="simulator to use (default: $SIM or icarus)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="build a multithreaded model with this many threads (Verilator only)")
+    parser.add_argument("--compare", default=None, metavar="SIM1,SIM2,...",
+                        help="run every job under each simulator and compare wall times against "
+                             "the first, e.g. icarus,verilator (use -j 1 for undisturbed timings)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always compile instead of reusing cached builds")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"build cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--cache-size", type=int, default=2048,
+                        help="build cache size bound in MB (default: 2048)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="run each block across its default parameter grid")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="sweep a parameter over the given values (repeatable, "
+                             "replaces the default grid for that parameter)")
+    parser.add_argument("--tb-sweep", action="store_true",
+                        help="run each block across its default testbench knob grid "
+                             "(e.g. async_fifo clock ratio, phase and jitter)")
+    parser.add_argument("-e", "--env", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="sweep a testbench knob, passed as an environment variable, "
+                             "over the given values (repeatable)")
+    parser.add_argument("--samples", type=int, default=None,
+                        help="run a random sample of this many points per block instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for --samples")
+    parser.add_argument("--waves", nargs="?", const="fst", default=None, choices=["fst", "vcd"],
+                        help="dump waveforms to <toplevel>.fst (default) or .vcd in each job's "
+                             "build directory")
+    parser.add_argument("--wave-window", default=None, metavar="START:STOP",
+                        help="only dump between these simulation times in ns, either end optional")
+    parser.add_argument("--wave-scope", default=None,
+                        help="only dump this instance, e.g. async_fifo.wr_ctr (default: toplevel)")
+    parser.add_argument("--wave-depth", type=int, default=0,
+                        help="levels of hierarchy to dump below the scope, 0 for all")
+    parser.add_argument("--csv", default=None,
+                        help="also write the results table to this CSV file")
+    parser.add_argument("--list", action="store_true",
+                        help="list the discovered blocks and exit")
+    return parser.parse_args()
+
+
+def report(result):
+    status = "PASS" if result.passed else "FAIL"
+    build = "cached" if result.cached else "compiled"
+    params = "".join(f" {k}={v}" for k, v in {**result.job.parameters, **result.job.env}.items())
+    sim = f" [{result.job.simulator}]" if args.compare else ""
+    print(f"{status} {result.job.block.name}/{result.job.module}{params}{sim} ({build}, {result.runtime:.2f}s)",
+          flush=True)
+    for name, value in result.metrics.items():
+        print(f"     {name} = {value}", flush=True)
+    if result.job.waves is not None:
+        dump = wave_file(result.job.sim_build, result.job.block.toplevel, result.job.waves)
+        gtkw = save_file(result.job.block, result.job.simulator)
+        print(f"     gtkwave {dump}{' ' + gtkw if gtkw else ''}", flush=True)
+    if not result.passed:
+        print(f"     {result.error}\n     see {result.log_file}", flush=True)
+
+
+##########################################
+##              RUN TEST                ##
+##########################################
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    blocks = discover_blocks()
+
+    if args.block:
+        unknown = set(args.block) - {b.name for b in blocks}
+        if unknown:
+            sys.exit(f"Unknown block(s): {', '.join(sorted(unknown))}")
+        blocks = [b for b in blocks if b.name in args.block]
+
+    if args.list:
+        for block in blocks:
+            print(f"{block.name:24} {block.path:16} {', '.join(block.modules)}")
+        sys.exit(0)
+
+    points = None
+    env = set()
+    if args.sweep or args.param or args.tb_sweep or args.env:
+        overrides = dict(parse_axis(p) for p in args.param)
+        env_overrides = dict(parse_axis(e) for e in args.env)
+        env.update(env_overrides)
+        points = {}
+        for block in blocks:
+            axes = dict(SWEEPS.get(block.name, {})) if args.sweep else {}
+            axes.update(overrides)
+            if args.tb_sweep:
+                axes.update(TB_SWEEPS.get(block.name, {}))
+                env.update(TB_SWEEPS.get(block.name, {}))
+            axes.update(env_overrides)
+            if axes:
+                points[block.name] = grid(axes) if args.samples is None \
+                    else sample(axes, args.samples, args.seed)
+
+    waves = None
+    if args.waves or args.wave_window or args.wave_scope or args.wave_depth:
+        start, stop = parse_window(args.wave_window) if args.wave_window else (None, None)
+        waves = Waves(args.waves or "fst", start, stop, args.wave_scope, args.wave_depth)
+
+    cache = None if args.no_cache else BuildCache(args.cache_dir, args.cache_size << 20)
+    # Compared simulators build side by side in their own directories
+    simulators = list(dict.fromkeys(s.strip() for s in args.compare.split(","))) if args.compare \
+        else [args.sim]
+    jobs = []
+    for sim in simulators:
+        build_dir = join(BUILD_DIR, sim) if args.compare else BUILD_DIR
+        jobs += make_jobs(blocks, build_dir, simulator=sim, cache=cache, points=points, env=env,
+                          waves=waves, threads=args.threads)
+    start = time.perf_counter()
+    results = run_jobs(jobs, args.jobs, callback=report)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(format_comparison(results, simulators) if args.compare else format_results(results))
+    if args.csv:
+        write_csv(results, args.csv)
+    print(f"\nWall time {elapsed:.2f}s, sum of job times {sum(r.runtime for r in results):.2f}s")
+    sys.exit(0 if all(r.passed for r in results) else 1)
@@ -16,7 +16,12 @@ module seven_segment_display #(
 
     localparam int TARGET_PERIOD = 16; //ms
     localparam int CLOCK_CYCLES  = TARGET_PERIOD*CLK_FREQ*100;
-    localparam int COUNTER_BITS  = SIM ? 8 : $clog2(CLOCK_CYCLES)+2;
+    localparam int FULL_BITS     = $clog2(CLOCK_CYCLES)+2;
+
+    // SIM shortens the refresh counter to SIM_BITS, so the digit scan
+    // runs 2**(FULL_BITS-SIM_BITS) times faster than in hardware
+    localparam int SIM_BITS      = 8;
+    localparam int COUNTER_BITS  = SIM ? SIM_BITS : FULL_BITS;
 
     logic [15:0] packed_bcd;
     logic [15:0] packed_bcd_reg;
@@ -95,11 +100,6 @@ module seven_segment_display #(
         end
     end
 
-   initial begin
-       $dumpfile("seven_segment_display.vcd");
-       $dumpvars();
-   end
-
 endmodule
 
 
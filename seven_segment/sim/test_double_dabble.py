@@ -0,0 +1,105 @@
+import time
+import cocotb
+import logging
+import numpy as np
+from array import array
+from test_classes import ClockDomain, results
+from cocotb.triggers import RisingEdge, with_timeout
+from cocotb.utils import get_sim_time
+
+
+NUM_BITS    = int(cocotb.top.NUM_BITS)
+CLK_PRD_ns  = 10
+
+# Upper bound on cycles per conversion: SHIFT, CHECK_LP and ADD per bit,
+# plus the IDLE and DONE states
+MAX_CYCLES  = 3*NUM_BITS + 4
+
+
+def bcd_table(num_bits):
+    '''
+    Golden packed BCD output for every input, computed in one pass. The
+    output holds four digits, so inputs past 9999 keep only their lower
+    four, exactly as the truncated shift register does.
+
+    :param num_bits: Width of binary_in
+    '''
+    values = np.arange(2**num_bits, dtype=np.int64) % 10000
+    bcd = np.zeros_like(values)
+    for digit in range(4):
+        bcd |= (values // 10**digit % 10) << (4*digit)
+    return bcd
+
+
+class TB():
+    def __init__(self, dut):
+        '''
+        This function initalizes the testbench, starts the clock
+        and sets all input values to their default state
+
+        :param self: Class instance
+        :param dut: Top level HDL file
+        '''
+        self.dut = dut
+        self.log = logging.getLogger("cocotb.tb")
+        ClockDomain.start(self.dut.clk, CLK_PRD_ns)
+
+        self.dut.binary_in.value = 0
+        self.dut.binary_in_valid.value = 0
+
+    async def cycle_reset(self):
+        self.dut.reset.setimmediatevalue(1)
+        await RisingEdge(self.dut.clk)
+        await RisingEdge(self.dut.clk)
+        self.dut.reset.value = 0
+        await RisingEdge(self.dut.clk)
+        await RisingEdge(self.dut.clk)
+
+    async def convert_all(self, num, outputs):
+        '''
+        Streams 0..num-1 through the converter. Each input is driven as
+        soon as the previous result is valid, which is when the FSM is
+        back in IDLE, so the converter never sits idle. The testbench
+        only wakes on the clock edge that takes an input and on the
+        result, not on every cycle of the conversion.
+        '''
+        clk = RisingEdge(self.dut.clk)
+        done = RisingEdge(self.dut.packed_bcd_out_valid)
+        for value in range(num):
+            self.dut.binary_in.value = value
+            self.dut.binary_in_valid.value = 1
+            await clk
+            self.dut.binary_in_valid.value = 0
+            await done
+            outputs.append(self.dut.packed_bcd_out.value.integer)
+
+
+@cocotb.test()
+async def test_double_dabble(dut):
+    '''Exhaustive test of the binary to BCD converter'''
+
+    tb = TB(dut)
+    await tb.cycle_reset()
+
+    num = 2**NUM_BITS
+    golden = bcd_table(NUM_BITS)
+    outputs = array('q')
+
+    sim_start = get_sim_time('ns')
+    wall_start = time.perf_counter()
+    await with_timeout(tb.convert_all(num, outputs), num*MAX_CYCLES*CLK_PRD_ns, 'ns')
+    sim_time = (get_sim_time('ns') - sim_start) * 1e-9
+    wall_time = time.perf_counter() - wall_start
+
+    outputs = np.frombuffer(outputs, dtype=np.int64)
+    wrong = np.nonzero(outputs != golden)[0]
+    for value in wrong[:10]:
+        tb.log.error(f'{value} converted to {outputs[value]:04x}, expected {golden[value]:04x}')
+    assert len(wrong) == 0, f'{len(wrong)} of {num} conversions wrong'
+
+    cycles = sim_time * 1e9 / CLK_PRD_ns / num
+    tb.log.info(f'{num} conversions, {cycles:.1f} cycles each, '
+                f'{num/sim_time:.0f} per simulated second, {num/wall_time:.0f} per wall second')
+    results.record(cycles_per_conversion=round(cycles, 2),
+                   conversions_per_sim_s=round(num/sim_time),
+                   conversions_per_wall_s=round(num/wall_time))
@@ -1,9 +1,16 @@
 
-import random
+import math
+import os
 import cocotb
 import logging
-from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, ClockCycles
+import numpy as np
+from test_classes import ClockDomain, SevenSegmentMonitor
+from test_classes.seven_segment import DIGIT, expected_digits
+from cocotb.triggers import Edge, RisingEdge, ClockCycles
+
+
+# Values 0..NUM_VALUES-1 are each shown for one full digit scan
+NUM_VALUES = int(os.getenv("NUM_VALUES", 10000))
 
 
 class TB():
@@ -17,16 +24,24 @@ class TB():
         '''
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
         self.clk_freq_MHz = int(self.dut.CLK_FREQ.value)
         self.period_ns = int(1000/self.clk_freq_MHz)
-        cocotb.start_soon(Clock(self.dut.clk, self.period_ns, units='ns').start())
+
+        # Refresh counter width in hardware, computed the same way as the
+        # HDL, against the width it was built with, shorter in SIM mode
+        full_bits = math.ceil(math.log2(16*self.clk_freq_MHz*100)) + 2
+        counter_bits = len(self.dut.refresh_counter)
+        self.speedup = 2**(full_bits - counter_bits)
+        self.scan_cycles = 2**counter_bits
+        ClockDomain.start(self.dut.clk, self.period_ns)
 
         self.clk = self.dut.clk
         self.reset = self.dut.reset
         self.data_in = self.dut.data_in
         self.data_in_valid = self.dut.data_in_valid
         self.led_out = self.dut.led_out
+        self.enable = self.dut.enable
+        self.hex = int(self.dut.HEX.value)
 
         self.data_in_valid.value = 0
 
@@ -40,14 +55,23 @@ class TB():
         await RisingEdge(self.clk)
         await RisingEdge(self.clk)
 
-    def secs_to_cycles(self, seconds):
-        return self.clk_freq_MHz * seconds
+    async def wait_scans(self, num=1):
+        '''
+        Waits for the display to step through all four digits num times.
+        Only the enable changes wake the testbench, not every clock.
+        '''
+        for _ in range(4*num):
+            await Edge(self.enable)
 
-    def decode_seven_segment(self):
-        decoded_values = [0x03, 0x9F, 0x25, 0x0D, 0x99, 0x49, 0x41, 0x1F, 0x01, 0x09]
-        if self.led_out in decoded_values:
-            return decoded_values.index(self.led_out)
-        return None
+    async def wait_digit(self, digit):
+        '''
+        Waits for the display to move on to the given digit, 0 being
+        the most significant
+        '''
+        while True:
+            await Edge(self.enable)
+            if DIGIT.get(int(self.enable.value)) == digit:
+                return
 
     async def drive_value(self, value):
         await RisingEdge(self.clk)
@@ -63,18 +87,30 @@ async def test_seven_segment_display(dut):
     '''Test for seven segment display'''
 
     tb = TB(dut)
+    tb.log.info(f'Digit scan every {tb.scan_cycles} cycles, {tb.speedup}x faster than hardware')
 
     cocotb.start_soon(tb.cycle_reset(active_high=True))
     await ClockCycles(tb.clk, 20)
-
-    for _ in range(5):
-        number = random.randint(0,9999)
-        await tb.drive_value(number)
-        await ClockCycles(tb.clk, tb.secs_to_cycles(4))
-        # if number > 9:
-        #     assert(tb.decode_seven_segment() == None)
-        # else:
-        #     assert(number == tb.decode_seven_segment())
-
-    dut.log.info('Test done')
+    monitor = SevenSegmentMonitor(tb.enable, tb.led_out)
+
+    # The double dabble finishes within one digit period, so a value
+    # driven while the last digit is lit is shown for the whole next scan
+    scans = np.zeros(NUM_VALUES, dtype=np.int64)
+    for value in range(NUM_VALUES):
+        await tb.wait_digit(3)
+        scans[value] = monitor.scan + 1
+        await tb.drive_value(value)
+    await tb.wait_scans(2)
+
+    # Check every scan in one pass
+    shown = monitor.digits()
+    assert len(shown) > scans[-1], 'Display stopped scanning'
+    expected = expected_digits(np.arange(NUM_VALUES), tb.hex)
+    wrong = np.nonzero((shown[scans] != expected).any(axis=1))[0]
+    for value in wrong[:10]:
+        tb.log.error(f'{value} shown as {shown[scans[value]].tolist()}, expected {expected[value].tolist()}')
+    assert len(wrong) == 0, f'{len(wrong)} of {NUM_VALUES} values displayed wrong'
+
+    tb.log.info(f'{NUM_VALUES} values displayed correctly')
+    dut._log.info('Test done')
 
@@ -0,0 +1,11 @@
+from . import crc, metrics, pcap, results
+from .clock import ClockDomain, cycle_rst_n, jitter_clock
+from .eth import EthRxMonitor, FrameScoreboard
+from .fifo_probe import FifoProbe
+from .regmodel import RegisterModel
+from .scoreboard import Scoreboard
+from .seven_segment import SevenSegmentMonitor
+from .stream import StreamDriver, StreamMonitor
+from .trace import TraceSampler
+from .txlog import TxLog
+from .uart import UartDriver, UartMonitor
@@ -0,0 +1,216 @@
+import heapq
+import itertools
+import random
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import Event, RisingEdge, Timer
+from cocotb.utils import get_sim_steps, get_sim_time
+
+
+##########################################
+##           JITTERED CLOCK             ##
+##########################################
+
+async def jitter_clock(signal, period, phase=0, jitter=0, seed=None, units="ns"):
+    '''
+    Drives a 50% duty cycle clock whose every edge is moved by a random
+    offset of up to +/- jitter from its ideal position. The offsets do not
+    accumulate, so the average period stays exact however long the clock
+    runs. Use in place of cocotb.clock.Clock when two clock domains must
+    not stay locked to one phase relationship.
+
+    :param signal: Clock signal handle
+    :param period: Nominal clock period
+    :param phase: Delay before the first rising edge
+    :param jitter: Peak edge displacement, less than a quarter period
+    :param seed: Seed for the edge offsets
+    :param units: Units of period, phase and jitter
+    '''
+    if not 0 <= jitter < period / 4:
+        raise ValueError(f"Jitter {jitter} must be less than a quarter of the period {period}")
+
+    rng = random.Random(seed)
+    half = get_sim_steps(period / 2, units, round_mode="round")
+    wobble = get_sim_steps(jitter, units, round_mode="round")
+
+    signal.value = 0
+    if phase:
+        await Timer(get_sim_steps(phase, units, round_mode="round"), "step")
+
+    level = 1
+    offset = 0
+    while True:
+        signal.value = level
+        level ^= 1
+        next_offset = rng.randint(-wobble, wobble) if wobble else 0
+        await Timer(half + next_offset - offset, "step")
+        offset = next_offset
+
+
+
+##########################################
+##           CLOCK DOMAIN               ##
+##########################################
+
+class ClockDomain():
+    # One domain per clock handle for the running test
+    _domains = {}
+
+    def __init__(self, clk):
+        '''
+        Single subscriber to the rising edges of a clock. Testbench
+        components register plain callbacks instead of each awaiting their
+        own edge triggers, so an edge wakes one coroutine however many
+        components watch the clock. On every edge all monitor callbacks are
+        called, then all driver callbacks, each in the order they were
+        added, so every monitor samples before anything is driven. The
+        edges are only awaited while there is a callback or wait pending.
+        Use ClockDomain.of to share the domain of a clock.
+
+        :param self: Class instance
+        :param clk: Clock signal handle
+        '''
+        self.clk = clk
+        self.cycle = 0
+        self.now = get_sim_time()
+        self._monitors = []
+        self._drivers = []
+        self._callbacks = ()
+        self._waits = []
+        self._seq = itertools.count()
+        self._task = None
+
+    @classmethod
+    def of(cls, clk):
+        '''
+        Returns the domain of clk, creating it on first use in each test
+        '''
+        domain = cls._domains.get(clk)
+        # A dispatcher that did not stop by itself was killed with its test
+        if domain is None or (domain._task is not None and domain._task.done()):
+            domain = cls._domains[clk] = cls(clk)
+        return domain
+
+    @classmethod
+    def start(cls, clk, period, units="ns", phase=0, jitter=0, seed=None):
+        '''
+        Starts a clock on clk and returns its domain. A plain Clock is used
+        unless the first edge is delayed or the edges are jittered, which
+        needs jitter_clock.
+
+        :param clk: Clock signal handle
+        :param period: Clock period
+        :param units: Units of period, phase and jitter
+        :param phase: Delay before the first rising edge
+        :param jitter: Peak edge displacement
+        :param seed: Seed for the edge offsets
+        '''
+        if phase or jitter:
+            cocotb.start_soon(jitter_clock(clk, period, phase, jitter, seed, units))
+        else:
+            cocotb.start_soon(Clock(clk, period, units=units).start())
+        return cls.of(clk)
+
+    def add_monitor(self, callback):
+        '''
+        Calls callback() on every rising edge, before any driver
+        '''
+        self._monitors.append(callback)
+        self._update()
+
+    def add_driver(self, callback):
+        '''
+        Calls callback() on every rising edge, after every monitor
+        '''
+        self._drivers.append(callback)
+        self._update()
+
+    def remove(self, callback):
+        if callback in self._monitors:
+            self._monitors.remove(callback)
+        if callback in self._drivers:
+            self._drivers.remove(callback)
+        self._update()
+
+    def _update(self):
+        # Rebuilt on every change so callbacks may add or remove themselves
+        self._callbacks = tuple(self._monitors + self._drivers)
+        self._start()
+
+    def _start(self):
+        if self._task is None and (self._callbacks or self._waits):
+            self.now = get_sim_time()
+            self._task = cocotb.start_soon(self._dispatch())
+
+    def wait(self, cycles=1):
+        '''
+        Returns a trigger that fires on the rising edge cycles edges from
+        now, once every callback for that edge has run
+        '''
+        event = Event()
+        heapq.heappush(self._waits, (self.cycle + cycles, next(self._seq), event))
+        self._start()
+        return event.wait()
+
+    async def until(self, *handles, sample=None, timeout=None):
+        '''
+        Waits for the first rising edge at which every handle is high,
+        checked by a monitor callback rather than an edge trigger of its
+        own, so waiters on a handshake add no wakeups. Returns the value
+        of sample at that edge, True without sample, or None once timeout
+        edges have passed without a match.
+
+        :param handles: Signals that must all be sampled high
+        :param sample: Signal to read at the matching edge
+        :param timeout: Edges to wait before giving up, forever if None
+        '''
+        event = Event()
+        left = timeout
+
+        def check():
+            nonlocal left
+            if all(int(h.value) for h in handles):
+                value = True if sample is None else int(sample.value)
+            elif left is None or left > 1:
+                if left is not None:
+                    left -= 1
+                return
+            else:
+                value = None
+            self.remove(check)
+            event.set(value)
+
+        self.add_monitor(check)
+        await event.wait()
+        return event.data
+
+    async def reset(self, rst_n, cycles=2, active=0):
+        '''
+        Holds rst_n at its active level for cycles edges, then releases it
+        and waits another cycles edges
+        '''
+        rst_n.setimmediatevalue(active)
+        await self.wait(cycles)
+        rst_n.value = int(not active)
+        await self.wait(cycles)
+
+    async def _dispatch(self):
+        edge = RisingEdge(self.clk)
+        waits = self._waits
+        while self._callbacks or waits:
+            await edge
+            self.cycle += 1
+            self.now = get_sim_time()
+            for callback in self._callbacks:
+                callback()
+            while waits and waits[0][0] <= self.cycle:
+                heapq.heappop(waits)[2].set()
+        self._task = None
+
+
+async def cycle_rst_n(rst_n, clk):
+    '''
+    Pulses the active low reset rst_n for two cycles of clk
+    '''
+    await ClockDomain.of(clk).reset(rst_n)
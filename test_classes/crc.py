@@ -0,0 +1,180 @@
+'''
+Software model of the Ethernet CRC-32 computed by crc_8.sv.
+
+The register is kept in the usual reflected (LSB first) form with the
+polynomial 0xEDB88320, starting from all ones. After a frame and its FCS
+have been shifted in, the register holds RESIDUE. crc_8.sv holds the same
+register with the bit order reversed, which is where its P_RESIDUE of
+32'hC704DD7B comes from.
+
+The FCS itself is the inverted register, sent least significant byte first.
+'''
+
+import zlib
+import numpy as np
+
+
+##########################################
+##           CRC-32 MODEL               ##
+##########################################
+
+POLY        = 0xEDB88320
+INIT        = 0xFFFFFFFF
+RESIDUE     = 0xDEBB20E3
+
+
+def reflect32(x):
+    '''
+    Reverses the bit order of a 32 bit word
+    '''
+    return int(f"{x:032b}"[::-1], 2)
+
+
+P_RESIDUE = reflect32(RESIDUE)
+
+
+def _make_tables(num):
+    '''
+    Returns the slicing-by-num lookup tables. Table 0 is the standard byte
+    table, table k advances a byte through k further zero bytes.
+    '''
+    tables = np.zeros((num, 256), dtype=np.uint32)
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ POLY if c & 1 else c >> 1
+        tables[0, i] = c
+    for k in range(1, num):
+        prev = tables[k-1]
+        tables[k] = (prev >> 8) ^ tables[0][prev & 0xFF]
+    return tables
+
+
+TABLES = _make_tables(4)
+_TABLE = [int(x) for x in TABLES[0]]
+
+
+def crc32(data, crc=INIT):
+    '''
+    Returns the CRC register after shifting in data, without the final
+    inversion. A frame with a correct FCS leaves RESIDUE.
+
+    :param data: bytes-like object
+    :param crc: Starting register value
+    '''
+    for byte in data:
+        crc = (crc >> 8) ^ _TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def fcs(data):
+    '''
+    Returns the 4 FCS bytes to append to data. zlib computes the same
+    inverted register as crc32, in C, which matters for long captures.
+    '''
+    return zlib.crc32(data).to_bytes(4, "little")
+
+
+def check(data):
+    '''
+    Returns True if data ends in a correct FCS
+    '''
+    return zlib.crc32(data) == RESIDUE ^ 0xFFFFFFFF
+
+
+##########################################
+##           BATCH MODEL                ##
+##########################################
+
+def _init_terms(max_len):
+    '''
+    Returns the contribution of the all-ones start value after n bytes, for
+    every n up to max_len. The CRC is linear, so the register for a frame is
+    the CRC of its data from a zero start XORed with this term.
+    '''
+    terms = np.empty(max_len+1, dtype=np.uint32)
+    c = INIT
+    for n in range(max_len+1):
+        terms[n] = c
+        c = (c >> 8) ^ _TABLE[c & 0xFF]
+    return terms
+
+
+def crc32_batch(frames, lengths):
+    '''
+    Vectorized crc32 over many frames at once. Each row of frames holds one
+    frame, left aligned, of the matching length. Frames are right aligned
+    behind zero padding (which leaves a zero register unchanged) and then
+    consumed four bytes per step with the slicing-by-4 tables, so the work
+    per step is a handful of array operations over all frames.
+
+    :param frames: uint8 array of shape (num_frames, width)
+    :param lengths: Number of valid bytes in each row
+    '''
+    frames = np.asarray(frames, dtype=np.uint8)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    width = (frames.shape[1] + 3) & ~3
+
+    # Right align every frame in a zero padded, word aligned buffer
+    col = np.arange(width) - (width - lengths[:, None])
+    aligned = np.where(col >= 0, np.take_along_axis(frames, np.clip(col, 0, frames.shape[1]-1), axis=1), 0)
+    words = np.ascontiguousarray(aligned, dtype=np.uint8).view("<u4")
+
+    t0, t1, t2, t3 = TABLES
+    crc = np.zeros(len(frames), dtype=np.uint32)
+    for i in range(words.shape[1]):
+        crc ^= words[:, i]
+        crc = t3[crc & 0xFF] ^ t2[(crc >> 8) & 0xFF] ^ t1[(crc >> 16) & 0xFF] ^ t0[crc >> 24]
+
+    return crc ^ _init_terms(int(lengths.max(initial=0)))[lengths]
+
+
+def check_frames(frames, lengths):
+    '''
+    Returns a bool array, True where the frame ends in a correct FCS
+    '''
+    return crc32_batch(frames, lengths) == RESIDUE
+
+
+def random_frames(num, min_len=64, max_len=1518, rng=None):
+    '''
+    Generates num frames of random length and content, each ending in a
+    correct FCS. Returns the frames as a left aligned uint8 array of shape
+    (num, max_len) together with the frame lengths.
+
+    :param num: Number of frames
+    :param min_len: Shortest frame including FCS
+    :param max_len: Longest frame including FCS
+    :param rng: numpy Generator, a fresh one if None
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    lengths = rng.integers(min_len, max_len+1, size=num)
+    frames = rng.integers(0, 256, size=(num, max_len), dtype=np.uint8)
+    frames[np.arange(max_len) >= (lengths[:, None] - 4)] = 0
+
+    fcs_words = ~crc32_batch(frames, lengths-4)
+    rows = np.arange(num)
+    for k in range(4):
+        frames[rows, lengths-4+k] = (fcs_words >> (8*k)) & 0xFF
+
+    return frames, lengths
+
+
+def inject_bit_errors(frames, lengths, fraction, rng=None):
+    '''
+    Flips one random bit in a random fraction of the frames. Returns the
+    corrupted copy of frames and a bool array marking the frames that were hit.
+
+    :param frames: Frames returned by random_frames
+    :param lengths: Frame lengths
+    :param fraction: Fraction of frames to corrupt
+    :param rng: numpy Generator, a fresh one if None
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    frames = frames.copy()
+    hit = rng.random(len(frames)) < fraction
+    rows = np.flatnonzero(hit)
+    pos = (rng.random(len(rows)) * lengths[rows]).astype(np.int64)
+    bits = rng.integers(0, 8, size=len(rows), dtype=np.uint8)
+    frames[rows, pos] ^= (np.uint8(1) << bits)
+    return frames, hit
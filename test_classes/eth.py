@@ -0,0 +1,187 @@
+import logging
+from collections import deque, namedtuple
+
+from cocotb.utils import get_sim_time
+
+from .clock import ClockDomain
+
+
+##########################################
+##           CTRL WORD                  ##
+##########################################
+
+HDR_LEN     = 14            # destination, source and type
+MAX_FRAME   = 2048          # byte_cnt is 11 bits
+CNT_MASK    = MAX_FRAME - 1
+
+# ctrl[123:12] is the header as received, first byte on top, then the
+# error flag in bit 11 (crc_vld was low when the frame ended) and byte_cnt
+EthCtrl = namedtuple("EthCtrl", ["dest", "src", "type", "error", "byte_cnt"])
+
+
+def decode_ctrl(value):
+    '''
+    Splits a ctrl word into its fields, with the addresses as bytes
+
+    :param value: ctrl as an int
+    '''
+    header = (value >> 12).to_bytes(HDR_LEN, "big")
+    return EthCtrl(dest=header[0:6], src=header[6:12], type=int.from_bytes(header[12:14], "big"),
+                   error=(value >> 11) & 1, byte_cnt=value & CNT_MASK)
+
+
+##########################################
+##           MONITOR                    ##
+##########################################
+
+class EthRxMonitor():
+    def __init__(self, clk, data_out, data_out_vld, ctrl, ctrl_vld, callback, max_len=MAX_FRAME):
+        '''
+        Collects the data_out beats of each frame into one preallocated
+        buffer and hands them to callback together with the ctrl word that
+        closes the frame, as callback(ctrl, beats). beats is a view of the
+        buffer and is only valid during the call. The ctrl word is read
+        only on the cycle ctrl_vld is high.
+
+        :param self: Class instance
+        :param clk: Clock to sample on, shared through its ClockDomain
+        :param data_out: Payload byte handle
+        :param data_out_vld: Payload valid handle
+        :param ctrl: ctrl word handle
+        :param ctrl_vld: ctrl valid handle
+        :param callback: Called with the ctrl word and payload of each frame
+        :param max_len: Beats kept per frame, a longer frame is cut short
+        '''
+        self.data_out = data_out
+        self.data_out_vld = data_out_vld
+        self.ctrl = ctrl
+        self.ctrl_vld = ctrl_vld
+        self.callback = callback
+        self.domain = ClockDomain.of(clk)
+
+        self.buf = bytearray(max_len)
+        self.view = memoryview(self.buf)
+        self.num_beats = 0
+        self.sampling = False
+
+    def start(self):
+        '''
+        Starts sampling from the next rising edge, call once the DUT is
+        out of reset
+        '''
+        if not self.sampling:
+            self.sampling = True
+            self.num_beats = 0
+            self.domain.add_monitor(self._sample)
+
+    def stop(self):
+        if self.sampling:
+            self.sampling = False
+            self.domain.remove(self._sample)
+
+    def _sample(self):
+        if int(self.data_out_vld.value):
+            if self.num_beats < len(self.buf):
+                self.buf[self.num_beats] = int(self.data_out.value)
+            self.num_beats += 1
+        if int(self.ctrl_vld.value):
+            num = min(self.num_beats, len(self.buf))
+            self.num_beats = 0
+            self.callback(int(self.ctrl.value), self.view[:num])
+
+
+##########################################
+##           SCOREBOARD                 ##
+##########################################
+
+class FrameScoreboard():
+    def __init__(self, name="eth"):
+        '''
+        Frame level scoreboard for eth_rx_fsm. put predicts what each sent
+        frame produces and check compares a ctrl word and its payload
+        against the prediction, the header and the payload each in one
+        comparison.
+
+        Frames shorter than the header never leave the idle state and
+        produce nothing. Every other frame ends in one ctrl word. A frame
+        that ends with crc_vld high is good; otherwise it is closed by the
+        idle byte after it, which raises the error flag and adds that byte
+        to the payload. byte_cnt is one less than the number of payload
+        beats either way.
+
+        :param self: Class instance
+        :param name: Name used in log and assertion messages
+        '''
+        self.name = name
+        self.log = logging.getLogger(f"cocotb.tb.{name}")
+        self.expected = deque()
+        self.num_put = 0
+        self.num_checked = 0
+        self.num_runts = 0
+        self.num_errors = 0
+
+    def __len__(self):
+        return len(self.expected)
+
+    def put(self, frame, crc_ok):
+        '''
+        Predicts the output for a frame sent with crc_vld raised on its
+        last byte when crc_ok is set
+
+        :param frame: Frame bytes as sent, FCS included
+        :param crc_ok: Whether crc_vld is raised with the last byte
+        '''
+        self.num_put += 1
+        if len(frame) < HDR_LEN:
+            self.num_runts += 1
+            return
+        # crc_vld on the last header byte is not seen, the fsm is still idle
+        error = int(not crc_ok or len(frame) == HDR_LEN)
+        self.expected.append((bytes(frame), error))
+
+    def _fail(self, index, msg):
+        msg = f'{self.name}: frame {index} at {get_sim_time("ns")} ns: {msg}'
+        self.log.error(msg)
+        raise AssertionError(msg)
+
+    def check(self, ctrl, beats):
+        '''
+        Compares one ctrl word and the payload beats collected before it
+        against the oldest prediction
+
+        :param ctrl: ctrl word as an int
+        :param beats: data_out bytes of the frame
+        '''
+        index = self.num_checked
+        self.num_checked += 1
+        if not self.expected:
+            self._fail(index, f'got {decode_ctrl(ctrl)}, nothing expected')
+
+        frame, error = self.expected.popleft()
+        if ctrl >> 12 != int.from_bytes(frame[:HDR_LEN], "big"):
+            self._fail(index, f'got header {decode_ctrl(ctrl)}, expected {frame[:HDR_LEN].hex()}')
+
+        fields = decode_ctrl(ctrl)
+        payload = frame[HDR_LEN:]
+        num_beats = len(payload) + error
+        if fields.error != error:
+            self._fail(index, f'error flag {fields.error}, expected {error}')
+        if fields.byte_cnt != (num_beats - 1) & CNT_MASK:
+            self._fail(index, f'byte_cnt {fields.byte_cnt}, expected {(num_beats - 1) & CNT_MASK}')
+        if len(beats) != num_beats:
+            self._fail(index, f'{len(beats)} payload beats, expected {num_beats}')
+        if beats[:len(payload)] != payload:
+            self._fail(index, f'payload {bytes(beats[:len(payload)]).hex()}, expected {payload.hex()}')
+        self.num_errors += error
+
+    def finish(self):
+        '''
+        Call at the end of the test. Raises if a predicted frame never
+        produced its ctrl word.
+        '''
+        self.log.info(f'{self.name}: {self.num_checked} frames checked, {self.num_errors} with '
+                      f'the error flag, {self.num_runts} runts dropped, {self.num_put} sent')
+        if self.expected:
+            msg = f'{self.name}: {len(self.expected)} frames never closed by ctrl_vld'
+            self.log.error(msg)
+            raise AssertionError(msg)
@@ -0,0 +1,196 @@
+import csv
+import json
+from array import array
+
+import numpy as np
+from cocotb.utils import get_sim_time, get_time_from_sim_steps
+
+from . import results
+from .clock import ClockDomain
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Exact latency values are exported as they are until there are more than
+# this many distinct ones, then they are binned
+MAX_BINS = 100
+
+
+def _ns(steps):
+    return get_time_from_sim_steps(steps, "ns")
+
+
+class _LowTime():
+    def __init__(self, name):
+        '''
+        Time a status output spends low, with the length of each low run
+        in clock cycles
+        '''
+        self.name = name
+        self.cycles = 0
+        self.total_cycles = 0
+        self.steps = 0
+        self.total_steps = 0
+        self.runs = array("I")
+        self.run = 0
+
+    def summary(self):
+        runs = np.frombuffer(self.runs, dtype=np.uint32).copy()
+        if self.run:
+            runs = np.append(runs, self.run)
+        length, count = np.unique(runs, return_counts=True)
+        return {
+            "cycles": self.cycles,
+            "time_ns": _ns(self.steps),
+            "fraction": self.steps / self.total_steps if self.total_steps else 0.0,
+            "runs": {"length": length.tolist(), "count": count.tolist()},
+        }
+
+
+class FifoProbe():
+    def __init__(self, wr_clk, wr_vld, wr_rdy, rd_clk, rd_vld, rd_rdy, name="fifo"):
+        '''
+        Passive instrumentation for a valid/ready FIFO. Every write and read
+        handshake is timestamped into an array, along with the time wr_rdy
+        (full) and rd_vld (empty) spend low. Nothing is derived until export,
+        so the per-cycle cost is two signal reads and an array append.
+        Start it after reset, as every handshake seen is counted.
+
+        :param self: Class instance
+        :param wr_clk: Write clock
+        :param wr_vld: Write valid handle
+        :param wr_rdy: Write ready handle
+        :param rd_clk: Read clock, the same as wr_clk for a synchronous FIFO
+        :param rd_vld: Read valid handle
+        :param rd_rdy: Read ready handle
+        :param name: Prefix for the exported files and recorded metrics
+        '''
+        self.name = name
+        self.wr_times = array("q")
+        self.rd_times = array("q")
+        self.full = _LowTime("wr_rdy")
+        self.empty = _LowTime("rd_vld")
+
+        for clk, vld, rdy, times, status, low in (
+                (wr_clk, wr_vld, wr_rdy, self.wr_times, wr_rdy, self.full),
+                (rd_clk, rd_vld, rd_rdy, self.rd_times, rd_vld, self.empty)):
+            domain = ClockDomain.of(clk)
+            domain.add_monitor(self._watcher(domain, vld, rdy, times, status, low))
+
+    @staticmethod
+    def _watcher(domain, vld, rdy, times, status, low):
+        last = get_sim_time()
+
+        def watch():
+            nonlocal last
+            now = domain.now
+            period = now - last
+            last = now
+            low.total_cycles += 1
+            low.total_steps += period
+
+            if int(vld.value) and int(rdy.value):
+                times.append(now)
+            if int(status.value):
+                if low.run:
+                    low.runs.append(low.run)
+                    low.run = 0
+            else:
+                low.cycles += 1
+                low.steps += period
+                low.run += 1
+
+        return watch
+
+    def latency(self):
+        '''
+        Returns the latency of every word in ns, write handshake to read
+        handshake, for the words that have been read so far
+        '''
+        num = min(len(self.wr_times), len(self.rd_times))
+        wr = np.array(self.wr_times[:num], dtype=np.int64)
+        rd = np.array(self.rd_times[:num], dtype=np.int64)
+        return _ns(1) * (rd - wr)
+
+    def occupancy(self):
+        '''
+        Returns (levels, time_ns): how long the FIFO held each number of
+        words, counting a word from its write handshake to its read
+        handshake
+        '''
+        wr = np.frombuffer(self.wr_times, dtype=np.int64).copy()
+        rd = np.frombuffer(self.rd_times, dtype=np.int64).copy()
+        if not len(wr):
+            return np.zeros(1, dtype=np.int64), np.zeros(1)
+        times = np.concatenate((wr, rd))
+        delta = np.concatenate((np.ones(len(wr), np.int64), -np.ones(len(rd), np.int64)))
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        level = np.cumsum(delta[order])
+        durations = np.diff(times, append=times[-1])
+        time_at = np.bincount(np.maximum(level, 0), weights=durations)
+        return np.arange(len(time_at)), _ns(1) * time_at
+
+    def summary(self):
+        '''
+        Returns the latency percentiles and histogram, occupancy histogram
+        and full/empty time as a dict
+        '''
+        latency = self.latency()
+        if len(np.unique(latency)) > MAX_BINS:
+            counts, edges = np.histogram(latency, bins=MAX_BINS)
+            bins = edges[:-1]
+        else:
+            bins, counts = np.unique(latency, return_counts=True)
+        levels, time_at = self.occupancy()
+        total = time_at.sum()
+
+        return {
+            "name": self.name,
+            "writes": len(self.wr_times),
+            "reads": len(self.rd_times),
+            "latency_ns": {
+                "min": float(latency.min()) if len(latency) else 0.0,
+                "max": float(latency.max()) if len(latency) else 0.0,
+                "mean": float(latency.mean()) if len(latency) else 0.0,
+                "percentiles": {f"p{p:g}": float(np.percentile(latency, p)) if len(latency) else 0.0
+                                for p in PERCENTILES},
+                "histogram": {"bin": bins.tolist(), "count": counts.tolist()},
+            },
+            "occupancy": {
+                "max": int(levels[time_at > 0].max()) if total else 0,
+                "mean": float((levels * time_at).sum() / total) if total else 0.0,
+                "histogram": {"level": levels.tolist(), "time_ns": time_at.tolist()},
+            },
+            "wr_rdy_low": self.full.summary(),
+            "rd_vld_low": self.empty.summary(),
+        }
+
+    def export(self):
+        '''
+        Writes <name>_stats.json and <name>_stats.csv to the simulation
+        directory and records the headline figures with the test results.
+        The CSV has one row per histogram bin: histogram, bin, value.
+        '''
+        stats = self.summary()
+        with open(f"{self.name}_stats.json", "w") as f:
+            json.dump(stats, f, indent=2)
+
+        with open(f"{self.name}_stats.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["histogram", "bin", "value"])
+            hist = stats["latency_ns"]["histogram"]
+            writer.writerows(("latency_ns", b, c) for b, c in zip(hist["bin"], hist["count"]))
+            hist = stats["occupancy"]["histogram"]
+            writer.writerows(("occupancy_ns", b, c) for b, c in zip(hist["level"], hist["time_ns"]))
+            for key in ("wr_rdy_low", "rd_vld_low"):
+                runs = stats[key]["runs"]
+                writer.writerows((f"{key}_runs", b, c) for b, c in zip(runs["length"], runs["count"]))
+
+        latency = stats["latency_ns"]["percentiles"]
+        results.record(**{
+            f"{self.name}_latency_p50_ns": round(latency["p50"], 3),
+            f"{self.name}_latency_p99_ns": round(latency["p99"], 3),
+            f"{self.name}_max_occupancy": stats["occupancy"]["max"],
+        })
+        return stats
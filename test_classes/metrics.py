@@ -0,0 +1,286 @@
+'''
+Runtime metrics for testbenches.
+
+Components register counters, gauges and fixed-bucket histograms by name
+and update them as they run. Metrics are off unless METRICS is set to a
+flush interval in wall clock seconds, e.g. METRICS=5. While off, every
+lookup returns one shared object whose methods do nothing, so a component
+pays a no-op method call per update and nothing per clock. Counters and
+gauges can also be given a function that is only called when the metrics
+are read, for figures a component already keeps such as its stall count.
+
+While on, a snapshot of every metric is appended to metrics_live.jsonl
+each interval so a soak run can be followed with tail -f, and finish()
+logs a summary and records it with results.record.
+
+    metrics.start('stream')
+    words = metrics.counter('uart.sent')
+    words.inc()
+    ...
+    metrics.finish()
+'''
+
+import json
+import logging
+import os
+import time
+from bisect import bisect_right
+
+import cocotb
+from cocotb.triggers import Timer
+from cocotb.utils import get_sim_time
+
+from . import results
+
+
+##########################################
+##           CONFIGURATION              ##
+##########################################
+
+LIVE_FILE = "metrics_live.jsonl"
+
+INTERVAL = float(os.getenv("METRICS", 0) or 0)
+ENABLED = INTERVAL > 0
+
+# Simulated time between checks of the wall clock when flushing starts,
+# adjusted as the run goes so the checks stay cheap
+FIRST_CHECK_NS = 1000
+
+log = logging.getLogger("cocotb.metrics")
+
+
+##########################################
+##           METRIC TYPES               ##
+##########################################
+
+class Counter():
+    def __init__(self, name, fn=None):
+        '''
+        Monotonic count, either kept here or read from fn
+
+        :param self: Class instance
+        :param name: Metric name
+        :param fn: Returns the count when the metric is read
+        '''
+        self.name = name
+        self.fn = fn
+        self.count = 0
+
+    def inc(self, n=1):
+        self.count += n
+
+    @property
+    def value(self):
+        return self.count if self.fn is None else self.fn()
+
+
+class Gauge():
+    def __init__(self, name, fn=None):
+        '''
+        Last value set, or the value of fn when the metric is read
+
+        :param self: Class instance
+        :param name: Metric name
+        :param fn: Returns the value when the metric is read
+        '''
+        self.name = name
+        self.fn = fn
+        self.last = 0
+
+    def set(self, value):
+        self.last = value
+
+    @property
+    def value(self):
+        return self.last if self.fn is None else self.fn()
+
+
+class Histogram():
+    def __init__(self, name, edges):
+        '''
+        Counts of observations in fixed buckets. Bucket i holds values
+        below edges[i] and at or above edges[i-1], the last bucket holds
+        everything from edges[-1] up.
+
+        :param self: Class instance
+        :param name: Metric name
+        :param edges: Increasing bucket boundaries
+        '''
+        self.name = name
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.total = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    @property
+    def value(self):
+        return {"edges": self.edges, "counts": list(self.counts), "count": self.total, "sum": self.sum}
+
+
+class _Null():
+    # Stands in for every metric while metrics are off
+    value = 0
+
+    def inc(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+NULL = _Null()
+
+
+##########################################
+##           REGISTRY                   ##
+##########################################
+
+_metrics = {}
+_session = {"name": None, "sim_ns": 0.0, "wall": 0.0, "task": None}
+
+
+def _get(cls, name, *args):
+    if not ENABLED:
+        return NULL
+    metric = _metrics.get(name)
+    if not isinstance(metric, cls):
+        metric = _metrics[name] = cls(name, *args)
+    return metric
+
+
+def counter(name, fn=None):
+    '''
+    Returns the counter called name, creating it on first use. Giving
+    fn replaces the function an existing counter reads.
+    '''
+    metric = _get(Counter, name, fn)
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def gauge(name, fn=None):
+    '''
+    Returns the gauge called name, creating it on first use. Giving fn
+    replaces the function an existing gauge reads.
+    '''
+    metric = _get(Gauge, name, fn)
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def histogram(name, edges):
+    '''
+    Returns the histogram called name, creating it with edges on first use
+    '''
+    return _get(Histogram, name, edges)
+
+
+def snapshot():
+    '''
+    Returns the current value of every metric along with the simulated
+    and wall clock time since start
+    '''
+    sim_ns = get_sim_time("ns") - _session["sim_ns"]
+    wall = time.perf_counter() - _session["wall"]
+    return {
+        "test": _session["name"],
+        "sim_ns": sim_ns,
+        "wall_s": round(wall, 3),
+        "metrics": {name: metric.value for name, metric in sorted(_metrics.items())},
+    }
+
+
+def flush():
+    '''
+    Appends a snapshot to the live file
+    '''
+    with open(LIVE_FILE, "a") as f:
+        f.write(json.dumps(snapshot()) + "\n")
+
+
+async def _flush_loop():
+    period = FIRST_CHECK_NS
+    last_check = last_flush = time.perf_counter()
+    while True:
+        await Timer(period, "ns")
+        now = time.perf_counter()
+        # Aim for a few wall clock checks per interval
+        elapsed = now - last_check
+        if elapsed < INTERVAL / 8:
+            period *= 2
+        elif elapsed > INTERVAL / 2 and period > 1:
+            period //= 2
+        last_check = now
+        if now - last_flush >= INTERVAL:
+            flush()
+            last_flush = now
+
+
+def start(name=None):
+    '''
+    Starts a metrics session for the running test. Metrics left over from
+    an earlier test are dropped, so call this before building the
+    components that register metrics. Does nothing while metrics are off.
+
+    :param name: Session name used in the live file and the summary
+    '''
+    if not ENABLED:
+        return
+    task = _session["task"]
+    if task is not None and not task.done():
+        task.kill()
+    _metrics.clear()
+    _session.update(name=name, sim_ns=get_sim_time("ns"), wall=time.perf_counter(),
+                    task=cocotb.start_soon(_flush_loop()))
+
+
+def finish():
+    '''
+    Flushes a final snapshot, then logs and records a summary of the
+    session: every counter with its rate per simulated second, the gauges,
+    histogram counts and how much simulated time passed per wall clock
+    second. Does nothing while metrics are off.
+    '''
+    if not ENABLED:
+        return
+    task = _session["task"]
+    if task is not None:
+        task.kill()
+        _session["task"] = None
+    flush()
+
+    snap = snapshot()
+    name = snap["test"] or "metrics"
+    sim_s = snap["sim_ns"] * 1e-9
+    wall_s = max(snap["wall_s"], 1e-3)
+    ratio = sim_s / wall_s
+    log.info(f'{name}: {snap["sim_ns"]:.0f} ns simulated in {wall_s:.2f} s, '
+             f'sim/wall {ratio:.3g}')
+
+    figures = {f'{name}_sim_wall_ratio': float(f'{ratio:.4g}')}
+    for metric in _metrics.values():
+        value = metric.value
+        if isinstance(metric, Counter):
+            rate = value / sim_s if sim_s else 0.0
+            log.info(f'{name}: {metric.name} {value}, {rate:.4g}/s simulated, '
+                     f'{value / wall_s:.4g}/s wall')
+            figures[f'{name}_{metric.name}'.replace('.', '_')] = value
+        elif isinstance(metric, Gauge):
+            log.info(f'{name}: {metric.name} {value}')
+        else:
+            buckets = ", ".join(f'<{edge}: {count}' for edge, count in zip(metric.edges, metric.counts))
+            mean = metric.sum / metric.total if metric.total else 0.0
+            log.info(f'{name}: {metric.name} {metric.total} samples, mean {mean:.4g}, '
+                     f'{buckets}, >={metric.edges[-1]}: {metric.counts[-1]}')
+    results.record(**figures)
+    _metrics.clear()
@@ -0,0 +1,121 @@
+'''
+Lazy reader for pcap and pcapng captures.
+
+The capture is memory mapped and walked one record at a time, so only the
+frame being yielded is ever copied out of the file. Multi-GB captures can be
+replayed in bounded memory, and the first frame is available as soon as the
+file is opened.
+'''
+
+import mmap
+import struct
+
+
+##########################################
+##           FILE FORMATS               ##
+##########################################
+
+LINKTYPE_ETHERNET = 1
+
+# pcap global header magic, as read little endian
+PCAP_MAGIC = {
+    0xA1B2C3D4: "<",    # microsecond timestamps
+    0xA1B23C4D: "<",    # nanosecond timestamps
+    0xD4C3B2A1: ">",
+    0x4D3CB2A1: ">",
+}
+
+# pcapng block types
+BLOCK_SHB   = 0x0A0D0D0A
+BLOCK_IDB   = 0x00000001
+BLOCK_OPB   = 0x00000002
+BLOCK_SPB   = 0x00000003
+BLOCK_EPB   = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+
+def _pcap_frames(mm, linktypes):
+    endian = PCAP_MAGIC[struct.unpack_from("<I", mm, 0)[0]]
+    linktype = struct.unpack_from(endian + "I", mm, 20)[0] & 0xFFFF
+    if linktype not in linktypes:
+        return
+
+    record = struct.Struct(endian + "IIII")
+    offset = 24
+    while offset + record.size <= len(mm):
+        _, _, incl_len, _ = record.unpack_from(mm, offset)
+        offset += record.size
+        if offset + incl_len > len(mm):
+            return
+        yield mm[offset:offset+incl_len]
+        offset += incl_len
+
+
+def _pcapng_frames(mm, linktypes):
+    endian = "<"
+    interfaces = []
+    offset = 0
+    while offset + 12 <= len(mm):
+        block_type = struct.unpack_from("<I", mm, offset)[0]
+
+        # Each section sets its own byte order and interface list
+        if block_type == BLOCK_SHB:
+            magic = struct.unpack_from("<I", mm, offset+8)[0]
+            endian = "<" if magic == BYTE_ORDER_MAGIC else ">"
+            interfaces = []
+        else:
+            block_type = struct.unpack_from(endian + "I", mm, offset)[0]
+
+        block_len = struct.unpack_from(endian + "I", mm, offset+4)[0]
+        if block_len < 12 or offset + block_len > len(mm):
+            return
+        body = offset + 8
+
+        if block_type == BLOCK_IDB:
+            linktype, _, snaplen = struct.unpack_from(endian + "HHI", mm, body)
+            interfaces.append((linktype, snaplen))
+
+        elif block_type == BLOCK_EPB:
+            if_id, _, _, cap_len, _ = struct.unpack_from(endian + "IIIII", mm, body)
+            if if_id < len(interfaces) and interfaces[if_id][0] in linktypes:
+                yield mm[body+20:body+20+cap_len]
+
+        elif block_type == BLOCK_SPB:
+            orig_len = struct.unpack_from(endian + "I", mm, body)[0]
+            cap_len = min(orig_len, block_len - 16)
+            if interfaces and interfaces[0][0] in linktypes:
+                yield mm[body+4:body+4+cap_len]
+
+        elif block_type == BLOCK_OPB:
+            if_id, _, _, _, cap_len, _ = struct.unpack_from(endian + "HHIIII", mm, body)
+            if if_id < len(interfaces) and interfaces[if_id][0] in linktypes:
+                yield mm[body+20:body+20+cap_len]
+
+        offset += block_len
+
+
+def read_frames(path, linktypes=(LINKTYPE_ETHERNET,)):
+    '''
+    Yields the captured bytes of every packet in a pcap or pcapng file, in
+    file order. Packets captured on other link types are skipped.
+
+    :param path: Capture file
+    :param linktypes: Link types to yield, Ethernet by default
+    '''
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return
+
+    with mm:
+        if len(mm) < 4:
+            return
+        magic = struct.unpack_from("<I", mm, 0)[0]
+        if magic in PCAP_MAGIC:
+            yield from _pcap_frames(mm, linktypes)
+        elif magic == BLOCK_SHB:
+            yield from _pcapng_frames(mm, linktypes)
+        else:
+            raise ValueError(f"{path} is not a pcap or pcapng file")
@@ -0,0 +1,165 @@
+from cocotb.utils import get_sim_time
+
+from . import metrics
+
+
+##########################################
+##           REGISTER MODEL             ##
+##########################################
+
+# Access latency buckets, in ns
+LATENCY_EDGES = (20, 50, 100, 200, 500, 1000, 2000)
+
+class RegisterModel():
+    def __init__(self, num_rw, num_ro, data_width=32, reset=0, name="regs"):
+        '''
+        Mirror of a register map with num_rw read/write registers followed
+        by num_ro read only registers, one data word apart. Writes update
+        whole registers, as axil_slave_if ignores the write strobes, and
+        reads are predicted straight from the mirror without any queue or
+        await. Read only registers are set from the PL side with set_ro.
+
+        :param self: Class instance
+        :param num_rw: Number of read/write registers (P_NUM_RW_REG)
+        :param num_ro: Number of read only registers (P_NUM_RO_REG)
+        :param data_width: Register width in bits (P_DATA_WIDTH)
+        :param reset: Reset value of every register
+        :param name: Name used in log and assertion messages
+        '''
+        self.num_rw = num_rw
+        self.num_ro = num_ro
+        self.num_bytes = data_width // 8
+        self.name = name
+        self.reset_value = reset
+        self.mirror = bytearray()
+        self.reset()
+
+        self.writes = metrics.counter(f"{name}.writes")
+        self.reads = metrics.counter(f"{name}.reads")
+        self.latency = metrics.histogram(f"{name}.latency_ns", LATENCY_EDGES)
+
+    def __len__(self):
+        return self.num_rw + self.num_ro
+
+    def reset(self):
+        word = self.reset_value.to_bytes(self.num_bytes, "little")
+        self.mirror = bytearray(word * len(self))
+
+    def address(self, index):
+        return index * self.num_bytes
+
+    def index(self, addr):
+        return addr // self.num_bytes
+
+    def is_ro(self, index):
+        return index >= self.num_rw
+
+    def predict_write(self, addr, data):
+        '''
+        Updates the mirror for a write of data (bytes) starting at byte
+        address addr. axil_slave_if ignores s_axi_wstrb and stores the
+        whole data word, so every register touched takes the bytes given
+        and zero in the byte lanes the master pads. Words that land in
+        read only registers are dropped.
+        '''
+        first = addr - addr % self.num_bytes
+        end = addr + len(data)
+        end += -end % self.num_bytes
+        words = bytearray(end - first)
+        words[addr - first:addr - first + len(data)] = data
+        ro_start = self.num_rw * self.num_bytes
+        stop = min(end, ro_start)
+        if stop > first:
+            self.mirror[first:stop] = words[:stop - first]
+
+    def predict(self, addr, length=None):
+        '''
+        Returns the bytes a read of length bytes at addr should return,
+        one whole register by default
+        '''
+        length = self.num_bytes if length is None else length
+        return bytes(self.mirror[addr:addr + length])
+
+    def value(self, index):
+        '''
+        Returns the expected value of a register as an integer
+        '''
+        return int.from_bytes(self.predict(self.address(index)), "little")
+
+    def set_ro(self, index, value):
+        '''
+        Records a value driven onto a read only register from the PL side
+        '''
+        if not self.is_ro(index):
+            raise ValueError(f"{self.name}: register {index} is not read only")
+        addr = self.address(index)
+        self.mirror[addr:addr + self.num_bytes] = value.to_bytes(self.num_bytes, "little")
+
+    def check(self, addr, data):
+        '''
+        Compares bytes read at addr against the mirror
+        '''
+        expected = self.predict(addr, len(data))
+        if bytes(data) != expected:
+            for offset in range(0, len(data), self.num_bytes):
+                got = bytes(data[offset:offset + self.num_bytes])
+                want = expected[offset:offset + self.num_bytes]
+                if got != want:
+                    raise AssertionError(
+                        f"{self.name}: register {self.index(addr + offset)} read "
+                        f"0x{got[::-1].hex()}, expected 0x{want[::-1].hex()} "
+                        f"at {get_sim_time('ns')}ns")
+
+    def check_value(self, index, value):
+        '''
+        Compares a register value seen on the PL side against the mirror
+        '''
+        expected = self.value(index)
+        if int(value) != expected:
+            raise AssertionError(f"{self.name}: register {index} is {int(value):#x}, "
+                                 f"expected {expected:#x} at {get_sim_time('ns')}ns")
+
+    ##########################################
+    ##           FRONTDOOR ACCESS           ##
+    ##########################################
+
+    async def write(self, axim, addr, data):
+        '''
+        Writes bytes through an AxiLiteMaster and updates the mirror. The
+        master zero pads unaligned or short writes to whole words, and the
+        DUT writes the whole word.
+        '''
+        self.predict_write(addr, data)
+        start = get_sim_time("ns") if metrics.ENABLED else 0
+        await axim.write(addr, data)
+        self.writes.inc()
+        if metrics.ENABLED:
+            self.latency.observe(get_sim_time("ns") - start)
+
+    async def read(self, axim, addr, length=None):
+        '''
+        Reads through an AxiLiteMaster and checks the data against the
+        mirror. Returns the data read.
+        '''
+        length = self.num_bytes if length is None else length
+        start = get_sim_time("ns") if metrics.ENABLED else 0
+        rd_data = await axim.read(addr, length)
+        self.reads.inc()
+        if metrics.ENABLED:
+            self.latency.observe(get_sim_time("ns") - start)
+        self.check(addr, rd_data.data)
+        return rd_data.data
+
+    async def write_all(self, axim, values):
+        '''
+        Writes a value to every read/write register in one burst of
+        back to back accesses
+        '''
+        data = b"".join(v.to_bytes(self.num_bytes, "little") for v in values)
+        await self.write(axim, 0, data)
+
+    async def read_all(self, axim):
+        '''
+        Reads every register, read only ones included, and checks them
+        '''
+        return await self.read(axim, 0, len(self) * self.num_bytes)
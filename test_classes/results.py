@@ -0,0 +1,29 @@
+import json
+import os
+
+
+##########################################
+##           TEST RESULTS               ##
+##########################################
+
+# The regression runner reads this file back from the sim_build directory
+# after each job and reports its contents next to the pass/fail status
+METRICS_FILE = "metrics.json"
+
+
+def record(**metrics):
+    '''
+    Saves named figures of merit (throughput, latency, ...) for the
+    current simulation. Values recorded by earlier tests in the same run
+    are kept unless they use the same name.
+
+    :param metrics: Name and numeric value of each figure
+    '''
+    try:
+        with open(METRICS_FILE) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    saved.update(metrics)
+    with open(METRICS_FILE, "w") as f:
+        json.dump(saved, f, indent=2, sort_keys=True)
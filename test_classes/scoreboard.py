@@ -0,0 +1,67 @@
+import logging
+from collections import deque
+
+from cocotb.utils import get_sim_time
+
+
+class Scoreboard():
+    def __init__(self, name="sb"):
+        '''
+        In-order scoreboard that checks actual against expected values as
+        they arrive. Expected values are queued with put and compared with
+        check, both plain calls with no awaits, so a check costs a deque pop
+        and a compare rather than a trigger and a task wakeup.
+
+        :param self: Class instance
+        :param name: Name used in log and assertion messages
+        '''
+        self.name = name
+        self.log = logging.getLogger(f"cocotb.tb.{name}")
+        self.expected = deque()
+        self.num_put = 0
+        self.num_checked = 0
+
+    def __len__(self):
+        return len(self.expected)
+
+    def put(self, value):
+        '''
+        Queues an expected value
+        '''
+        self.expected.append(value)
+        self.num_put += 1
+
+    def check(self, actual):
+        '''
+        Compares actual against the oldest expected value and returns the
+        expected value. Raises with the item index and simulation time on a
+        mismatch, or if nothing was expected.
+
+        :param actual: Value observed on the DUT
+        '''
+        index = self.num_checked
+        self.num_checked += 1
+        if not self.expected:
+            msg = f'{self.name}: item {index} at {get_sim_time("ns")} ns: got {int(actual)}, nothing expected'
+            self.log.error(msg)
+            raise AssertionError(msg)
+
+        expected = self.expected.popleft()
+        if actual != expected:
+            msg = f'{self.name}: item {index} at {get_sim_time("ns")} ns: got {int(actual)}, expected {expected}'
+            self.log.error(msg)
+            raise AssertionError(msg)
+
+        return expected
+
+    def finish(self):
+        '''
+        Call at the end of the test. Raises if expected values were never
+        matched by the DUT.
+        '''
+        self.log.info(f'{self.name}: {self.num_checked} of {self.num_put} items checked')
+        if self.expected:
+            leftover = list(self.expected)[:10]
+            msg = f'{self.name}: {len(self.expected)} expected items never seen, first {leftover}'
+            self.log.error(msg)
+            raise AssertionError(msg)
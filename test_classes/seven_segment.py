@@ -0,0 +1,95 @@
+from array import array
+
+import cocotb
+import numpy as np
+from cocotb.triggers import Edge, ReadOnly
+
+
+##########################################
+##           SEGMENT DECODE             ##
+##########################################
+
+# led_out for each glyph, segments active low with the decimal point in
+# bit 0. 10-15 are the A-F glyphs shown in HEX mode.
+SEGMENTS = [
+    0x03, 0x9F, 0x25, 0x0D, 0x99, 0x49, 0x41, 0x1F,
+    0x01, 0x09, 0x11, 0xC1, 0x63, 0x85, 0x61, 0x71,
+]
+BLANK = -1
+
+# led_out -> glyph value, BLANK for a dark digit or any other pattern
+DECODE = np.full(256, BLANK, dtype=np.int8)
+DECODE[SEGMENTS] = np.arange(len(SEGMENTS))
+
+# enable is active low, digit 0 is the most significant
+DIGIT = {0b1110: 0, 0b1101: 1, 0b1011: 2, 0b0111: 3}
+
+
+def expected_digits(values, hex_mode=False):
+    '''
+    Returns the four glyphs the display should show for each value, as an
+    (N, 4) array with BLANK for dark digits
+
+    :param values: Values driven on data_in
+    :param hex_mode: HEX parameter of the display
+    '''
+    values = np.asarray(values, dtype=np.int64)
+    if hex_mode:
+        glyph = np.where(values < 16, values, BLANK)
+        return np.repeat(glyph[:, None], 4, axis=1)
+    return values[:, None] // np.array([1000, 100, 10, 1]) % 10
+
+
+##########################################
+##           MONITOR                    ##
+##########################################
+
+class SevenSegmentMonitor():
+    def __init__(self, enable, led_out):
+        '''
+        Follows the multiplexed digit scan and rebuilds the four displayed
+        glyphs once per refresh cycle. led_out is sampled once per digit,
+        after enable has moved to it, so the testbench only wakes four
+        times per scan. Scans are stored as packed glyphs and decoded in
+        one pass by digits().
+
+        :param self: Class instance
+        :param enable: Active low digit enables
+        :param led_out: Segment outputs
+        '''
+        self.enable = enable
+        self.led_out = led_out
+        self.scan = -1
+        self.patterns = array("I")
+
+        cocotb.start_soon(self._run())
+
+    async def _run(self):
+        edge = Edge(self.enable)
+        settle = ReadOnly()
+        packed = 0
+        while True:
+            await edge
+            await settle
+            digit = DIGIT.get(int(self.enable.value))
+            if digit is None:
+                continue
+            if digit == 0:
+                self.scan += 1
+                packed = 0
+            elif self.scan < 0:
+                # Joined mid scan
+                continue
+
+            led = self.led_out.value
+            packed |= (led.integer if led.is_resolvable else 0xFF) << (8 * (3 - digit))
+            if digit == 3:
+                self.patterns.append(packed)
+
+    def digits(self):
+        '''
+        Returns the glyphs of every complete scan as an (N, 4) array
+        '''
+        packed = np.frombuffer(self.patterns, dtype=np.uint32).copy()
+        leds = packed[:, None] >> np.array([24, 16, 8, 0], dtype=np.uint32) & 0xFF
+        return DECODE[leds].astype(np.int64)
@@ -0,0 +1,210 @@
+import itertools
+import random
+from collections import deque
+
+from cocotb.triggers import Event
+
+from . import metrics
+from .clock import ClockDomain
+
+
+##########################################
+##           BURST PATTERNS             ##
+##########################################
+
+# A pattern is an iterator yielding 1 for every clock cycle a port may be
+# active and 0 for an idle cycle. The driver uses it to gate new beats on
+# the valid side, the monitor to drive ready.
+
+def always():
+    return itertools.repeat(1)
+
+
+def burst(active, idle):
+    '''
+    active cycles on, then idle cycles off, repeated
+    '''
+    return itertools.cycle([1]*active + [0]*idle)
+
+
+def random_pattern(duty, seed=None):
+    '''
+    Each cycle is active with probability duty
+    '''
+    rng = random.Random(seed)
+    while True:
+        yield int(rng.random() < duty)
+
+
+class PortStats():
+    def __init__(self, name):
+        '''
+        Handshake counters for one valid/ready port
+
+        :param self: Class instance
+        :param name: Port name for reporting
+        '''
+        self.name = name
+        self.cycles = 0
+        self.beats = 0
+        self.stalls = 0         # valid high, ready low
+        self.starved = 0        # ready high, valid low
+        self.first_beat = None
+        self.last_beat = None
+
+    def beat(self):
+        if self.first_beat is None:
+            self.first_beat = self.cycles
+        self.last_beat = self.cycles
+        self.beats += 1
+
+    def sustained(self):
+        '''
+        Words per cycle between the first and last beat
+        '''
+        if not self.beats:
+            return 0.0
+        return self.beats / (self.last_beat - self.first_beat + 1)
+
+    def __str__(self):
+        return (f'{self.name}: {self.beats} beats in {self.cycles} cycles, '
+                f'{self.sustained():.3f} words/cycle sustained, '
+                f'{self.stalls} stalled, {self.starved} starved')
+
+
+##########################################
+##           DRIVER / MONITOR           ##
+##########################################
+
+class StreamDriver():
+    def __init__(self, clk, data, vld, rdy, pattern=None, callback=None, name="wr"):
+        '''
+        Drives words into a valid/ready port. valid is held high across
+        back to back beats and only dropped when there is nothing to send
+        or the pattern asks for an idle cycle, so the port can take one
+        word per clock.
+
+        :param self: Class instance
+        :param clk: Port clock, shared through its ClockDomain
+        :param data: Data input handle
+        :param vld: Valid input handle
+        :param rdy: Ready output handle
+        :param pattern: Burst pattern, always active if None
+        :param callback: Called with each word as its handshake completes
+        :param name: Port name for reporting
+        '''
+        self.clk = clk
+        self.data = data
+        self.vld = vld
+        self.rdy = rdy
+        self.pattern = always() if pattern is None else pattern
+        self.callback = callback
+        self.stats = PortStats(name)
+
+        self.queue = deque()
+        self.idle = Event()
+        self.idle.set()
+        self.active = False
+        self.word = None
+
+        stats = self.stats
+        metrics.counter(f'stream.{name}.words', lambda: stats.beats)
+        metrics.counter(f'stream.{name}.stalls', lambda: stats.stalls)
+
+        self.vld.value = 0
+        domain = ClockDomain.of(clk)
+        domain.add_monitor(self._sample)
+        domain.add_driver(self._drive)
+
+    def send(self, words):
+        '''
+        Queues words to be sent, without waiting
+        '''
+        self.queue.extend(words)
+        if self.queue:
+            self.idle.clear()
+
+    async def wait(self):
+        '''
+        Waits until every queued word has been accepted
+        '''
+        await self.idle.wait()
+
+    def _sample(self):
+        stats = self.stats
+        stats.cycles += 1
+        if self.active:
+            if int(self.rdy.value):
+                stats.beat()
+                if self.callback is not None:
+                    self.callback(self.word)
+                self.active = False
+            else:
+                stats.stalls += 1
+
+    def _drive(self):
+        if self.active:
+            return
+        if self.queue and next(self.pattern):
+            self.word = self.queue.popleft()
+            self.data.value = self.word
+            self.vld.value = 1
+            self.active = True
+        else:
+            self.vld.value = 0
+            if not self.queue:
+                self.idle.set()
+
+
+class StreamMonitor():
+    def __init__(self, clk, data, vld, rdy, pattern=None, callback=None, name="rd"):
+        '''
+        Accepts words from a valid/ready port. ready is driven from the
+        pattern every cycle, independent of valid, and a word is taken on
+        every clock where both are high.
+
+        :param self: Class instance
+        :param clk: Port clock, shared through its ClockDomain
+        :param data: Data output handle
+        :param vld: Valid output handle
+        :param rdy: Ready input handle
+        :param pattern: Burst pattern, always ready if None
+        :param callback: Called with each word received
+        :param name: Port name for reporting
+        '''
+        self.clk = clk
+        self.data = data
+        self.vld = vld
+        self.rdy = rdy
+        self.pattern = always() if pattern is None else pattern
+        self.callback = callback
+        self.stats = PortStats(name)
+
+        self.ready = 0
+
+        stats = self.stats
+        metrics.counter(f'stream.{name}.words', lambda: stats.beats)
+        metrics.counter(f'stream.{name}.stalls', lambda: stats.stalls)
+        metrics.counter(f'stream.{name}.starved', lambda: stats.starved)
+
+        self.rdy.value = 0
+        domain = ClockDomain.of(clk)
+        domain.add_monitor(self._sample)
+        domain.add_driver(self._drive)
+
+    def _sample(self):
+        stats = self.stats
+        stats.cycles += 1
+        if int(self.vld.value):
+            if self.ready:
+                stats.beat()
+                if self.callback is not None:
+                    self.callback(int(self.data.value))
+            else:
+                stats.stalls += 1
+        elif self.ready:
+            stats.starved += 1
+
+    def _drive(self):
+        self.ready = next(self.pattern)
+        self.rdy.value = self.ready
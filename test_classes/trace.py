@@ -0,0 +1,148 @@
+import numpy as np
+
+from .clock import ClockDomain
+
+
+##########################################
+##           TRACE SAMPLER              ##
+##########################################
+
+# Column type for each signal width, wider signals are kept as Python ints
+_DTYPES = ((1, np.bool_), (8, np.uint8), (16, np.uint16), (32, np.uint32), (64, np.uint64))
+
+_UNKNOWN = str.maketrans("xXzZuUwW-", "000000000")
+
+
+def _dtype(width):
+    for bits, dtype in _DTYPES:
+        if width <= bits:
+            return dtype
+    return object
+
+
+def _read(handle):
+    value = handle.value
+    try:
+        return int(value)
+    except ValueError:
+        # X and Z bits are recorded as 0
+        return int(value.binstr.translate(_UNKNOWN), 2)
+
+
+class TraceSampler():
+    def __init__(self, clk, signals, chunk=1 << 16):
+        '''
+        Records a set of signals on every rising edge of clk into one
+        NumPy column per signal, plus the simulation time of the edge.
+        Columns are preallocated in chunks and a new chunk is added when
+        one fills, so nothing is copied while sampling however long the
+        run. Checks and statistics then run on whole columns at once.
+
+        :param self: Class instance
+        :param clk: Clock to sample on
+        :param signals: Dict of column name to signal handle, or a list
+                        of handles named after the signal
+        :param chunk: Samples per chunk
+        '''
+        if not isinstance(signals, dict):
+            signals = {h._name: h for h in signals}
+        self.names = list(signals)
+        self.handles = list(signals.values())
+        self.dtypes = [_dtype(len(h)) for h in self.handles]
+        self.chunk = chunk
+        self.domain = ClockDomain.of(clk)
+
+        self._chunks = {name: [] for name in ["time"] + self.names}
+        self._len = 0
+        self._pos = chunk
+        self._columns = None
+        self.sampling = False
+
+    def start(self):
+        '''
+        Starts sampling from the next rising edge
+        '''
+        if not self.sampling:
+            self.sampling = True
+            self.domain.add_monitor(self._sample)
+
+    def stop(self):
+        if self.sampling:
+            self.sampling = False
+            self.domain.remove(self._sample)
+
+    def _grow(self):
+        self._time = np.empty(self.chunk, dtype=np.int64)
+        self._chunks["time"].append(self._time)
+        self._columns = []
+        for name, dtype in zip(self.names, self.dtypes):
+            column = np.empty(self.chunk, dtype=dtype)
+            self._chunks[name].append(column)
+            self._columns.append(column)
+        self._pos = 0
+
+    def _sample(self):
+        if self._pos == self.chunk:
+            self._grow()
+        pos = self._pos
+        self._time[pos] = self.domain.now
+        for column, handle in zip(self._columns, self.handles):
+            column[pos] = _read(handle)
+        self._pos = pos + 1
+        self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def column(self, name):
+        '''
+        Returns every sample of a signal so far as one array, or the edge
+        times in simulation steps for "time"
+        '''
+        chunks = self._chunks[name]
+        if not chunks:
+            return np.empty(0, dtype=np.int64 if name == "time" else self.dtypes[self.names.index(name)])
+        return np.concatenate(chunks)[:self._len]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def columns(self):
+        return {name: self.column(name) for name in self._chunks}
+
+    def save(self, path):
+        '''
+        Writes every column to a compressed .npz file. Columns of signals
+        wider than 64 bits hold Python ints and need allow_pickle to load.
+        '''
+        np.savez_compressed(path, **self.columns())
+
+
+##########################################
+##           COLUMN HELPERS             ##
+##########################################
+
+def handshakes(vld, rdy):
+    '''
+    Returns the indices of the samples where both vld and rdy are high
+    '''
+    return np.flatnonzero(np.logical_and(vld, rdy))
+
+
+def rising(column):
+    '''
+    Returns the indices of the samples where column goes from zero to
+    non zero, counting a first sample that is already set
+    '''
+    high = np.asarray(column, dtype=bool)
+    return np.flatnonzero(high & ~np.concatenate(([False], high[:-1])))
+
+
+def runs(column):
+    '''
+    Returns (starts, lengths) of every run of consecutive non zero samples
+    '''
+    high = np.concatenate(([False], np.asarray(column, dtype=bool), [False]))
+    edges = np.flatnonzero(high[1:] != high[:-1])
+    starts, ends = edges[::2], edges[1::2]
+    return starts, ends - starts
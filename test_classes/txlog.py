@@ -0,0 +1,158 @@
+'''
+Compact binary transaction log.
+
+Each transaction is a fixed 24 byte record of simulation time, value,
+channel and status, packed into a buffer and written out a block at a
+time, so logging a word costs one struct pack rather than formatting a
+line for the terminal. The header carries the time unit and a fixed
+table of channel names, and each name is written into the table as its
+channel is registered, so a log cut short by a failing test reads back
+the same as one that was closed.
+
+The log is read back by memory mapping it as a NumPy record array, and
+txlog.py at the top of the repo queries it from the command line.
+'''
+
+import os
+import struct
+
+import numpy as np
+from cocotb.utils import get_sim_time, get_time_from_sim_steps
+
+
+##########################################
+##           FILE FORMAT                ##
+##########################################
+
+MAGIC = b"TXLOG\x00\x00\x01"
+HEADER = struct.Struct("<8sIId")        # magic, version, record size, ns per step
+RECORD = struct.Struct("<qQII")         # time, value, channel, status
+VERSION = 3
+
+MAX_CHANNELS = 64
+NAME_SIZE = 16                          # bytes per name, NUL padded
+NAMES_OFFSET = HEADER.size
+RECORDS_OFFSET = NAMES_OFFSET + MAX_CHANNELS * NAME_SIZE
+
+DTYPE = np.dtype([("time", "<i8"), ("value", "<u8"), ("channel", "<u4"), ("status", "<u4")])
+
+STATUS_OK = 0
+STATUS_MISMATCH = 1
+
+VALUE_MASK = (1 << 64) - 1
+
+
+class TxLog():
+    def __init__(self, path, buffer=4096):
+        '''
+        Buffered writer for a transaction log. The file is only created
+        when the first transaction is logged, so a testbench can always
+        make one and only the tests that log anything leave a file.
+
+        :param self: Class instance
+        :param path: Log file, relative to the simulation directory
+        :param buffer: Records held in memory between writes
+        '''
+        self.path = path
+        self.channels = []
+        self._ids = {}
+        self._buf = bytearray(RECORD.size * buffer)
+        self._pos = 0
+        self._file = None
+        self.count = 0
+
+    def channel(self, name):
+        '''
+        Returns the id to log transactions of the named channel with
+        '''
+        if name not in self._ids:
+            encoded = name.encode()
+            if len(encoded) > NAME_SIZE:
+                raise ValueError(f"Channel name {name} is longer than {NAME_SIZE} bytes")
+            if len(self.channels) == MAX_CHANNELS:
+                raise ValueError(f"A transaction log holds at most {MAX_CHANNELS} channels")
+            self._ids[name] = len(self.channels)
+            self.channels.append(name)
+            if self._file is not None:
+                self._write_name(self._ids[name], encoded)
+        return self._ids[name]
+
+    def _write_name(self, index, encoded):
+        end = self._file.tell()
+        self._file.seek(NAMES_OFFSET + index * NAME_SIZE)
+        self._file.write(encoded.ljust(NAME_SIZE, b"\0"))
+        self._file.seek(end)
+        self._file.flush()
+
+    def log(self, channel, value, status=STATUS_OK, time=None):
+        '''
+        Appends one transaction. Values wider than 64 bits keep their low
+        64 bits.
+
+        :param channel: Channel id from channel()
+        :param value: Transaction value
+        :param status: STATUS_OK, STATUS_MISMATCH or a testbench code
+        :param time: Simulation time in steps, now if None
+
+        Any status other than STATUS_OK is written straight to the file,
+        so the record survives a test that fails on the next line.
+        '''
+        if time is None:
+            time = get_sim_time()
+        RECORD.pack_into(self._buf, self._pos, time, value & VALUE_MASK, channel, status)
+        self._pos += RECORD.size
+        self.count += 1
+        if self._pos == len(self._buf) or status != STATUS_OK:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            if not self._pos:
+                return
+            self._file = open(self.path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, get_time_from_sim_steps(1, "ns")))
+            names = b"".join(name.encode().ljust(NAME_SIZE, b"\0") for name in self.channels)
+            self._file.write(names.ljust(RECORDS_OFFSET - NAMES_OFFSET, b"\0"))
+        self._file.write(memoryview(self._buf)[:self._pos])
+        self._file.flush()
+        self._pos = 0
+
+    def close(self):
+        '''
+        Writes out the buffered records and closes the file
+        '''
+        self.flush()
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+
+def read_log(path):
+    '''
+    Memory maps a log. Returns (records, channels, ns_per_step) where
+    records is a NumPy record array with time, value, channel and status
+    fields.
+
+    :param path: Log file
+    '''
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        magic, version, record_size, ns_per_step = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != DTYPE.itemsize:
+            raise ValueError(f"{path} is not a version {VERSION} transaction log")
+        table = f.read(RECORDS_OFFSET - NAMES_OFFSET)
+
+    channels = []
+    for index in range(MAX_CHANNELS):
+        name = table[index * NAME_SIZE:(index + 1) * NAME_SIZE].rstrip(b"\0")
+        if not name:
+            break
+        channels.append(name.decode())
+
+    num = max(size - RECORDS_OFFSET, 0) // DTYPE.itemsize
+    if num:
+        records = np.memmap(path, dtype=DTYPE, mode="r", offset=RECORDS_OFFSET, shape=(num,))
+    else:
+        records = np.empty(0, dtype=DTYPE)
+    return records, channels, ns_per_step
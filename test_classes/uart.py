@@ -0,0 +1,154 @@
+import logging
+
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import FallingEdge, Timer
+from cocotb.utils import get_sim_steps
+
+from . import metrics
+
+
+##########################################
+##           UART FRAMING               ##
+##########################################
+
+PARITY_NONE = 0
+PARITY_EVEN = 1
+PARITY_ODD  = 2
+
+
+def clks_per_bit(clk_freq, baud_rate):
+    '''
+    Clock cycles per bit, computed the same way as the HDL
+
+    :param clk_freq: Clock frequency in MHz (P_CLK_FREQ)
+    :param baud_rate: Baud rate (P_BAUD_RATE)
+    '''
+    return clk_freq * 1000000 // baud_rate
+
+
+def parity_bit(word, parity):
+    '''
+    Returns the parity bit for a word, or None for no parity. Even
+    parity makes the number of ones in the word and parity bit even.
+    '''
+    if parity == PARITY_NONE:
+        return None
+    ones = bin(word).count("1") & 1
+    return ones if parity == PARITY_EVEN else ones ^ 1
+
+
+def frame_bits(word, num_bits, num_stop, parity):
+    '''
+    Returns the line levels for one frame: start bit, data LSB first,
+    optional parity bit and stop bits
+    '''
+    bits = [0] + [(word >> i) & 1 for i in range(num_bits)]
+    par = parity_bit(word, parity)
+    if par is not None:
+        bits.append(par)
+    return bits + [1] * num_stop
+
+
+##########################################
+##           DRIVER / MONITOR           ##
+##########################################
+
+class UartDriver():
+    def __init__(self, uart_rx, bit_prd, num_bits=8, num_stop=1, parity=PARITY_NONE, units="ns"):
+        '''
+        Drives UART frames onto a receiver's input. Each bit is held with a
+        single Timer of one bit period, so Python wakes once per bit rather
+        than once per clock.
+
+        :param self: Class instance
+        :param uart_rx: Serial input handle of the receiver
+        :param bit_prd: Bit period, clks_per_bit times the clock period
+        :param num_bits: Data bits per frame (P_NUM_BITS)
+        :param num_stop: Stop bits per frame (P_NUM_STOP)
+        :param parity: PARITY_NONE, PARITY_EVEN or PARITY_ODD (P_PARITY)
+        :param units: Units of bit_prd
+        '''
+        self.uart_rx = uart_rx
+        self.num_bits = num_bits
+        self.num_stop = num_stop
+        self.parity = parity
+        self.bit = Timer(get_sim_steps(bit_prd, units, round_mode="round"), "step")
+        self.sent = metrics.counter("uart.sent")
+
+        self.uart_rx.value = 1
+
+    async def send(self, word):
+        '''
+        Sends one word and returns once its last stop bit has finished
+        '''
+        for level in frame_bits(word, self.num_bits, self.num_stop, self.parity):
+            self.uart_rx.value = level
+            await self.bit
+        self.sent.inc()
+
+
+class UartMonitor():
+    def __init__(self, uart_tx, bit_prd, num_bits=8, num_stop=1, parity=PARITY_NONE, units="ns"):
+        '''
+        Receives UART frames from a transmitter's output. A frame starts on
+        the falling edge of the start bit, then every bit is sampled in its
+        middle with one Timer per bit period. Framing and parity errors
+        fail the test.
+
+        :param self: Class instance
+        :param uart_tx: Serial output handle of the transmitter
+        :param bit_prd: Bit period, clks_per_bit times the clock period
+        :param num_bits: Data bits per frame (P_NUM_BITS)
+        :param num_stop: Stop bits per frame (P_NUM_STOP)
+        :param parity: PARITY_NONE, PARITY_EVEN or PARITY_ODD (P_PARITY)
+        :param units: Units of bit_prd
+        '''
+        self.uart_tx = uart_tx
+        self.num_bits = num_bits
+        self.num_stop = num_stop
+        self.parity = parity
+        self.log = logging.getLogger("cocotb.tb.uart")
+
+        steps = get_sim_steps(bit_prd, units, round_mode="round")
+        self.half_bit = Timer(steps // 2, "step")
+        self.bit = Timer(steps, "step")
+        self.queue = Queue()
+        self.received = metrics.counter("uart.received")
+        self.glitches = metrics.counter("uart.glitches")
+
+        cocotb.start_soon(self._run())
+
+    async def get(self):
+        '''
+        Returns the next received word
+        '''
+        return await self.queue.get()
+
+    async def _run(self):
+        start = FallingEdge(self.uart_tx)
+        while True:
+            await start
+            await self.half_bit
+            if self.uart_tx.value != 0:
+                self.log.warning("Glitch on uart_tx, start bit not held")
+                self.glitches.inc()
+                continue
+
+            word = 0
+            for i in range(self.num_bits):
+                await self.bit
+                word |= int(self.uart_tx.value) << i
+
+            if self.parity != PARITY_NONE:
+                await self.bit
+                par = int(self.uart_tx.value)
+                assert par == parity_bit(word, self.parity), \
+                    f"Parity error on UART word {word:#x}"
+
+            for _ in range(self.num_stop):
+                await self.bit
+                assert self.uart_tx.value == 1, f"Framing error on UART word {word:#x}"
+
+            self.received.inc()
+            self.queue.put_nowait(word)
@@ -0,0 +1,135 @@
+'''
+Queries transaction logs written by test_classes.TxLog, e.g. from a
+job's sim_build directory:
+
+    python txlog.py stats fifo.txlog
+    python txlog.py show fifo.txlog --channel rd --status 1
+    python txlog.py diff run1/fifo.txlog run2/fifo.txlog
+    python txlog.py rate fifo.txlog --window 1000
+'''
+
+import argparse
+import sys
+
+import numpy as np
+
+from test_classes.txlog import read_log
+
+
+##########################################
+##           COMMAND LINE               ##
+##########################################
+
+def _select(records, channels, channel=None, status=None, start=None, stop=None, ns_per_step=1.0):
+    mask = np.ones(len(records), dtype=bool)
+    if channel is not None:
+        if channel not in channels:
+            sys.exit(f"Unknown channel {channel}, the log has {', '.join(channels)}")
+        mask &= records["channel"] == channels.index(channel)
+    if status is not None:
+        mask &= records["status"] == status
+    if start is not None:
+        mask &= records["time"] * ns_per_step >= start
+    if stop is not None:
+        mask &= records["time"] * ns_per_step < stop
+    return records[mask]
+
+
+def cmd_show(args):
+    records, channels, ns = read_log(args.log)
+    selected = _select(records, channels, args.channel, args.status, args.start, args.stop, ns)
+    for rec in selected[:args.limit]:
+        print(f"{rec['time'] * ns:14.3f} ns  {channels[rec['channel']]:10} {rec['value']:#x}"
+              + (f"  status {rec['status']}" if rec["status"] else ""))
+    if args.limit is not None and len(selected) > args.limit:
+        print(f"... {len(selected) - args.limit} more")
+
+
+def cmd_stats(args):
+    records, channels, ns = read_log(args.log)
+    print(f"{len(records)} transactions in {args.log}")
+    print(f"{'CHANNEL':10} {'COUNT':>10} {'ERRORS':>8} {'FIRST (ns)':>14} {'LAST (ns)':>14} {'PER US':>10}")
+    for index, name in enumerate(channels):
+        times = records["time"][records["channel"] == index]
+        errors = np.count_nonzero(records["status"][records["channel"] == index])
+        if not len(times):
+            print(f"{name:10} {0:>10}")
+            continue
+        span = (times[-1] - times[0]) * ns
+        rate = 1000 * (len(times) - 1) / span if span else 0.0
+        print(f"{name:10} {len(times):>10} {errors:>8} {times[0] * ns:>14.3f} {times[-1] * ns:>14.3f} "
+              f"{rate:>10.3f}")
+
+
+def cmd_rate(args):
+    records, channels, ns = read_log(args.log)
+    selected = _select(records, channels, args.channel, ns_per_step=ns)
+    if not len(selected):
+        return
+    window = selected["time"] * ns // args.window
+    bins, counts = np.unique(window, return_counts=True)
+    for start, count in zip(bins, counts):
+        print(f"{start * args.window:14.3f} ns  {count:>8}  {1000 * count / args.window:10.3f} per us")
+
+
+def cmd_diff(args):
+    a, a_channels, _ = read_log(args.a)
+    b, b_channels, _ = read_log(args.b)
+    if args.channel is not None:
+        for path, channels in ((args.a, a_channels), (args.b, b_channels)):
+            if args.channel not in channels:
+                sys.exit(f"Unknown channel {args.channel}, {path} has {', '.join(channels)}")
+    names = [args.channel] if args.channel else [c for c in a_channels if c in b_channels]
+    differ = False
+    for name in names:
+        va = a["value"][a["channel"] == a_channels.index(name)]
+        vb = b["value"][b["channel"] == b_channels.index(name)]
+        num = min(len(va), len(vb))
+        mismatch = np.flatnonzero(va[:num] != vb[:num])
+        if len(va) != len(vb) or len(mismatch):
+            differ = True
+        line = f"{name:10} {len(va):>10} vs {len(vb):<10} {len(mismatch)} values differ"
+        if len(mismatch):
+            i = mismatch[0]
+            line += f", first at transaction {i}: {va[i]:#x} vs {vb[i]:#x}"
+        print(line)
+    for name in set(a_channels) ^ set(b_channels):
+        differ = True
+        print(f"{name:10} only in {args.a if name in a_channels else args.b}")
+    return 1 if differ else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query transaction logs written by test_classes.TxLog")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    show = sub.add_parser("show", help="print the transactions that match the filters")
+    show.add_argument("log")
+    show.add_argument("--channel", default=None)
+    show.add_argument("--status", type=int, default=None)
+    show.add_argument("--start", type=float, default=None, help="from this time in ns")
+    show.add_argument("--stop", type=float, default=None, help="up to this time in ns")
+    show.add_argument("--limit", type=int, default=None, help="print at most this many")
+    show.set_defaults(func=cmd_show)
+
+    stats = sub.add_parser("stats", help="count, errors and rate per channel")
+    stats.add_argument("log")
+    stats.set_defaults(func=cmd_stats)
+
+    rate = sub.add_parser("rate", help="transactions per time window")
+    rate.add_argument("log")
+    rate.add_argument("--channel", default=None)
+    rate.add_argument("--window", type=float, default=1000.0, help="window in ns (default: 1000)")
+    rate.set_defaults(func=cmd_rate)
+
+    diff = sub.add_parser("diff", help="compare the values of each channel in two logs")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--channel", default=None)
+    diff.set_defaults(func=cmd_diff)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(args.func(args) or 0)
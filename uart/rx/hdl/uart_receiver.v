@@ -181,10 +181,4 @@ module uart_receiver # (
     end
     
 
-
-    initial begin
-        $dumpfile("uart_receiver.vcd");
-        $dumpvars();
-    end
-    
    endmodule
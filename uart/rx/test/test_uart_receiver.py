@@ -2,10 +2,8 @@
 import random
 import cocotb
 import logging
-import sys
-sys.path.append("../../../../..")
-import test_classes
-from cocotb.clock import Clock
+from test_classes import ClockDomain, TxLog, UartDriver, cycle_rst_n, metrics
+from test_classes.txlog import STATUS_MISMATCH, STATUS_OK
 from cocotb.queue import Queue
 from cocotb.triggers import Timer, RisingEdge, ClockCycles, First, Combine
 
@@ -19,6 +17,12 @@ NUM_WORDS   = 20
 
 CLKS_PER_BIT = int(CLK_FREQ*1000000/BAUD_RATE)
 CLK_PRD_ns = int(1000/CLK_FREQ)
+BIT_PRD_ns = CLKS_PER_BIT*CLK_PRD_ns
+
+# Start, data, parity and stop bits of one frame, with margin for the
+# receiver to flag the word
+FRAME_ns = (1 + NUM_BITS + (PARITY != 0) + NUM_STOP)*BIT_PRD_ns
+WORD_TIMEOUT_ns = 2*FRAME_ns
 
 class TB():
     def __init__(self, dut):
@@ -31,32 +35,35 @@ class TB():
         '''
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
         self.sb = Queue()
+        metrics.start('uart_receiver')
         self.dut.uart_word_rdy.value = 1
         
-        cocotb.start_soon(Clock(dut.clk, CLK_PRD_ns, units='ns').start())
+        self.domain = ClockDomain.start(dut.clk, CLK_PRD_ns)
+
+        self.txlog = TxLog('uart_receiver.txlog')
+        self.rx_ch = self.txlog.channel('rx')
+
+        self.uart_driver = UartDriver(self.dut.uart_rx, BIT_PRD_ns, NUM_BITS, NUM_STOP, PARITY)
 
-        self.uart_driver = test_classes.UartDriver(self.dut.clk, self.dut.uart_rx, BAUD_RATE, NUM_BITS, NUM_STOP, PARITY, self.sb)
+    async def send(self):
+        '''
+        Method to send a random word and add it to the scoreboard
+        '''
+        word = random.randint(0, 2**NUM_BITS-1)
+        await self.sb.put(word)
+        await self.uart_driver.send(word)
 
     async def uart_check(self):
         '''
         Method to check data against scoreboard
         '''
-        await RisingEdge(self.dut.uart_word_vld)
-        uart_word = self.dut.uart_word
+        uart_word = await self.domain.until(self.dut.uart_word_vld, sample=self.dut.uart_word)
         sb_word = await self.sb.get()
-        self.log.info(f'Sent {int(sb_word)}, Received {int(uart_word)}')
-        assert (uart_word == sb_word)
+        self.txlog.log(self.rx_ch, uart_word, STATUS_OK if uart_word == sb_word else STATUS_MISMATCH)
+        assert (uart_word == sb_word), f'Sent {sb_word}, Received {uart_word}'
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
 
 
@@ -67,17 +74,23 @@ async def test_uart_receiver(dut):
 
     tb = TB(dut)
 
-    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+    try:
+        cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
 
-    await ClockCycles(dut.clk, 1000)
+        await ClockCycles(dut.clk, 1000)
 
-    for _ in range(NUM_WORDS):
-        send_op = cocotb.start_soon(tb.uart_driver.send())
-        check_op = cocotb.start_soon(tb.uart_check())
-        done = Combine(send_op, check_op)
-        await First(done, Timer(500, 'us'))
+        for _ in range(NUM_WORDS):
+            send_op = cocotb.start_soon(tb.send())
+            check_op = cocotb.start_soon(tb.uart_check())
+            done = Combine(send_op, check_op)
+            await First(done, Timer(WORD_TIMEOUT_ns, 'ns'))
+            # A late word would leave two drivers on uart_rx
+            assert send_op.done() and check_op.done(), f'No word received within {WORD_TIMEOUT_ns} ns'
 
 
-    await ClockCycles(dut.clk, 10000)
+        await ClockCycles(dut.clk, 10000)
+    finally:
+        tb.txlog.close()
+    metrics.finish()
     dut._log.info('Test done')
 
@@ -102,10 +102,4 @@ module uart_transmitter # (
         end
     end
 
-
-    initial begin
-        $dumpfile("uart_transmitter.vcd");
-        $dumpvars();
-    end
-    
    endmodule
@@ -2,12 +2,10 @@
 import random
 import cocotb
 import logging
-import sys
-sys.path.append("../../../../..")
-import test_classes
-from cocotb.clock import Clock
+from test_classes import ClockDomain, TxLog, UartMonitor, cycle_rst_n, metrics
+from test_classes.txlog import STATUS_MISMATCH, STATUS_OK
 from cocotb.queue import Queue
-from cocotb.triggers import RisingEdge, ClockCycles, FallingEdge
+from cocotb.triggers import RisingEdge, ClockCycles, FallingEdge, with_timeout
 
 NUM_BITS    = int(cocotb.top.P_NUM_BITS)
 CLK_FREQ    = int(cocotb.top.P_CLK_FREQ)
@@ -19,17 +17,24 @@ BIT_PRD     = int(1e9/BAUD_RATE)
 
 CLKS_PER_BIT = int(CLK_FREQ*1000000/BAUD_RATE)
 CLK_PRD_ns = int(1000/CLK_FREQ)
+BIT_PRD_ns = CLKS_PER_BIT*CLK_PRD_ns
+FRAME_ns = (1 + NUM_BITS + (PARITY != 0) + NUM_STOP)*BIT_PRD_ns
+# A word may wait out the frame still on the line before its own
+WORD_TIMEOUT_ns = 3*FRAME_ns
 
 class TB():
     def __init__(self, dut):
         self.dut = dut
         self.log = logging.getLogger("cocotb.tb")
-        self.log.setLevel(logging.DEBUG)
         self.sb = Queue()
+        metrics.start('uart_transmitter')
 
-        self.uart_monitor = test_classes.UartMonitor(self.dut.clk, self.dut.uart_tx, BAUD_RATE, NUM_BITS, NUM_STOP, PARITY, self.sb)
+        self.uart_monitor = UartMonitor(self.dut.uart_tx, BIT_PRD_ns, NUM_BITS, NUM_STOP, PARITY)
         
-        cocotb.start_soon(Clock(dut.clk, CLK_PRD_ns, units='ns').start())
+        ClockDomain.start(dut.clk, CLK_PRD_ns)
+
+        self.txlog = TxLog('uart_transmitter.txlog')
+        self.tx_ch = self.txlog.channel('tx')
 
         self.dut.data_in.value = 0
         self.dut.data_in_vld.value = 0
@@ -49,13 +54,6 @@ class TB():
         await FallingEdge(self.dut.clk)
 
 
-async def cycle_rst_n(rst_n, clk):
-    rst_n.setimmediatevalue(0)
-    await RisingEdge(clk)
-    await RisingEdge(clk)
-    rst_n.value = 1
-    await RisingEdge(clk)
-    await RisingEdge(clk)
 
  
 @cocotb.test()
@@ -64,16 +62,20 @@ async def test_uart_transmitter(dut):
 
     tb = TB(dut)
 
-    cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
+    try:
+        cocotb.start_soon(cycle_rst_n(tb.dut.rst_n, tb.dut.clk))
 
-    await ClockCycles(dut.clk, 1000)
+        await ClockCycles(dut.clk, 1000)
 
 
-    for _ in range(NUM_WORDS):
-        cocotb.start_soon(tb.write_word())
-        rd_data = await tb.uart_monitor.get()
-        sb_data = await tb.sb.get()
-        tb.log.info(f'sent {sb_data}, got {rd_data}')
-        assert (rd_data == sb_data)
+        for _ in range(NUM_WORDS):
+            cocotb.start_soon(tb.write_word())
+            rd_data = await with_timeout(tb.uart_monitor.get(), WORD_TIMEOUT_ns, 'ns')
+            sb_data = await tb.sb.get()
+            tb.txlog.log(tb.tx_ch, rd_data, STATUS_OK if rd_data == sb_data else STATUS_MISMATCH)
+            assert (rd_data == sb_data), f'sent {sb_data}, got {rd_data}'
 
+    finally:
+        tb.txlog.close()
+    metrics.finish()
     dut._log.info('Test done')